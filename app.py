@@ -1,12 +1,27 @@
+import abc
+import hashlib
+import json
+import math
+import multiprocessing
 import os
+import re
+import shutil
+import sys
+from contextlib import contextmanager
+from functools import lru_cache
 from glob import glob
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from io import BytesIO
+import openpyxl
 import pandas as pd
 import streamlit as st
 import sqlite3
-from contextlib import closing
+import threading
 import time
+import weakref
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
 # Initialize database AFTER set_page_config in main()
@@ -15,6 +30,7 @@ db = None
 
 
 
+@lru_cache(maxsize=4096)
 def format_date(date_str):
     """Format date string, removing time portion"""
     if not date_str:
@@ -62,6 +78,39 @@ else:
     DBPATH = "hotelfo.db"
     ARRIVALS_ROOT = "data/arrivals"
 
+# Bulk arrivals loads: parser workers, and rows per write transaction
+IMPORT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+IMPORT_BATCH_ROWS = 5000
+
+# Parsed arrivals frames, keyed by file content hash and parser version; next to
+# app.py whatever directory the app is started from
+PARSE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".arrivals_cache")
+PARSE_CACHE_MAX_MB = 200
+PARSE_CACHE_MAX_AGE_DAYS = 90
+# Bump whenever the arrivals adapters / parse_arrivals_frame output changes
+ARRIVALS_PARSER_VERSION = 4
+# Optional JSON of {"reservations column": "export header"} overriding ARRIVALS_COLUMN_MAP
+ARRIVALS_MAPPING_FILE = "arrivals_mapping.json"
+
+# Background import of new arrivals files while the app runs
+ARRIVALS_WATCHER = True
+ARRIVALS_POLL_SECONDS = 30
+# A file must be unchanged for this long before it is imported (still being copied/saved)
+ARRIVALS_SETTLE_SECONDS = 15
+# Rescan file by file at least this often even if no directory mtime changed
+ARRIVALS_FULL_SCAN_SECONDS = 600
+# Mark bookings that drop out of a newer export for their arrival date (the PMS omits cancellations)
+FLAG_VANISHED_RESERVATIONS = True
+
+# Query instrumentation (can also be switched on from Admin > Query Profiling)
+QUERY_PROFILING = False
+SLOW_QUERY_MS = 100.0
+SLOW_QUERY_LOG = "slow_queries.log"
+
+# Attendant sheets: minutes per housekeeping task type, plus extra per task note
+HSK_TASK_MINUTES = {"CHECKOUT": 30, "STAYOVER": 15, "ARRIVAL": 10}
+HSK_NOTE_MINUTES = {"2 TWIN BEDS": 5, "VIP/SPECIAL": 10, "ACCESSIBLE ROOM": 5}
+
        
 
 # Fixed room inventory blocks: inclusive ranges (whole numbers)
@@ -92,180 +141,1435 @@ def clean_numeric_columns(df: pd.DataFrame, cols: list):
             df[col] = df[col].apply(lambda x: int(float(x)) if pd.notna(x) and str(x).strip() not in ['', 'None'] else x)
     return df
 
-class FrontOfficeDB:
-    def init_db(self):
-            with closing(self.get_conn()) as conn, conn:
-                c = conn.cursor()
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS reservations (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        amount_pending REAL,
-                        arrival_date TEXT,
-                        depart_date TEXT,
-                        room_number TEXT,
-                        room_type_code TEXT,
-                        adults INTEGER,
-                        children INTEGER,
-                        total_guests INTEGER,
-                        reservation_no TEXT,
-                        front_office_notes TEXT,
-                        voucher TEXT,
-                        related_reservation TEXT,
-                        crs_code TEXT,
-                        crs_name TEXT,
-                        guest_id_raw TEXT,
-                        guest_name TEXT,
-                        vip_flag TEXT,
-                        client_id TEXT,
-                        main_client TEXT,
-                        nights INTEGER,
-                        meal_plan TEXT,
-                        rate_code TEXT,
-                        channel TEXT,
-                        cancellation_policy TEXT,
-                        main_remark TEXT,
-                        contact_name TEXT,
-                        contact_phone TEXT,
-                        contact_email TEXT,
-                        total_remarks TEXT,
-                        source_of_business TEXT,
-                        stay_option_desc TEXT,
-                        remarks_by_chain TEXT,
-                        reservation_group_id TEXT,
-                        reservation_group_name TEXT,
-                        company_name TEXT,
-                        company_id_raw TEXT,
-                        country TEXT,
-                        reservation_status TEXT DEFAULT 'CONFIRMED',
-                        created_at TEXT DEFAULT (datetime('now')),
-                        updated_at TEXT DEFAULT (datetime('now'))
-                    )
-                """)
-                
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS stays (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        reservation_id INTEGER,
-                        room_number TEXT,
-                        status TEXT DEFAULT 'EXPECTED',
-                        checkin_planned TEXT,
-                        checkout_planned TEXT,
-                        checkin_actual TEXT,
-                        checkout_actual TEXT,
-                        breakfast_code TEXT,
-                        comment TEXT,
-                        parking_space TEXT,
-                        parking_plate TEXT,
-                        parking_notes TEXT,
-                        FOREIGN KEY (reservation_id) REFERENCES reservations(id)
-                    )
-                """)
-                # Safe migration: add front_office_notes if missing
-                try:
-                    c.execute("ALTER TABLE reservations ADD COLUMN front_office_notes TEXT")
-                except sqlite3.OperationalError:
-                    # Column already exists
-                    pass
 
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS rooms (
-                        room_number TEXT PRIMARY KEY,
-                        room_type TEXT,
-                        floor INTEGER,
-                        status TEXT DEFAULT 'VACANT',
-                        is_twin INTEGER DEFAULT 0
-                    )
-                """)
+def canonical_number(value):
+    """Canonical TEXT form of a room or reservation number.
 
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS tasks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        task_date TEXT,
-                        title TEXT,
-                        created_by TEXT,
-                        assigned_to TEXT,
-                        comment TEXT,
-                        created_at TEXT DEFAULT (datetime('now'))
-                    )
-                """)
+    '0302', '302.0' and 302.0 all become '302'; blanks and NaN become None.
+    Anything non-numeric is kept as stripped text.
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    text = str(value).strip()
+    if text in ("", "nan", "NaN", "None", "<NA>"):
+        return None
+    try:
+        num = float(text)
+    except ValueError:
+        return text
+    return str(int(num)) if num.is_integer() else text
 
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS no_shows (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        arrival_date TEXT,
-                        guest_name TEXT,
-                        main_client TEXT,
-                        charged INTEGER,
-                        amount_charged REAL,
-                        amount_pending REAL,
-                        comment TEXT,
-                        created_at TEXT DEFAULT (datetime('now'))
-                    )
-                """)
-                
-                c.execute('''
-                    CREATE TABLE IF NOT EXISTS invoices (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        invoice_no INTEGER UNIQUE,
-                        reservation_id INTEGER,
-                        guest_name TEXT,
-                        room_number TEXT,
-                        total_net REAL,
-                        total_vat REAL,
-                        total_amount REAL,
-                        invoice_date TEXT,
-                        created_at TEXT DEFAULT (datetime('now')),
-                        FOREIGN KEY (reservation_id) REFERENCES reservations(id)
-                    )
-                ''')
 
+def canonical_number_series(series: pd.Series) -> pd.Series:
+    """Vectorised canonical_number for a whole import column."""
+    if series is None:
+        return None
+    nums = pd.to_numeric(series, errors="coerce")
+    whole = nums.notna() & (nums == nums.round())
+    text = series.astype("string").str.strip()
+    text = text.mask(text.isin(["", "nan", "NaN", "None", "<NA>"]))
+    text = text.mask(whole, nums.where(whole).round().astype("Int64").astype("string"))
+    return text.astype(object).where(text.notna(), None)
 
-                # Safe migrations: add missing columns if DB is older
-                try:
-                    c.execute("ALTER TABLE no_shows ADD COLUMN amount_charged REAL")
-                except sqlite3.OperationalError:
-                    pass
 
+def room_floors(room_keys: pd.Series) -> pd.Series:
+    """Floor of each room, taken from its ROOM_BLOCKS block (start // 100); <NA> outside the blocks."""
+    keys = pd.to_numeric(room_keys, errors="coerce")
+    floors = pd.Series(pd.NA, index=keys.index, dtype="Int64")
+    for start, end in ROOM_BLOCKS:
+        floors[keys.between(start, end)] = start // 100
+    return floors
+
+
+def hsk_task_minutes(task: dict) -> int:
+    """Estimated minutes for one housekeeping task (HSK_TASK_MINUTES + HSK_NOTE_MINUTES)."""
+    return HSK_TASK_MINUTES.get(task["tasktype"], 0) + sum(HSK_NOTE_MINUTES.get(note, 0) for note in task["notes"])
+
+
+def _hsk_route_key(task: dict) -> tuple:
+    # Room order walks the ROOM_BLOCKS floors in turn; unknown rooms go last
+    try:
+        room = int(task["room"])
+    except (TypeError, ValueError):
+        return (2, 0, str(task["room"]))
+    in_blocks = any(start <= room <= end for start, end in ROOM_BLOCKS)
+    return (0 if in_blocks else 1, room, task["tasktype"])
+
+
+def _balance_hsk_sheets(sheets: list) -> list:
+    """Move tasks across the boundary of neighbouring sheets while that evens their load.
+
+    Sheets stay contiguous runs of rooms; every move lowers the larger of the
+    two loads, so the loop ends.
+    """
+    loads = [sum(t["minutes"] for t in sheet) for sheet in sheets]
+    moved = True
+    while moved:
+        moved = False
+        for i in range(len(sheets) - 1):
+            left, right = sheets[i], sheets[i + 1]
+            while left and loads[i + 1] + left[-1]["minutes"] < loads[i]:
+                task = left.pop()
+                right.insert(0, task)
+                loads[i] -= task["minutes"]
+                loads[i + 1] += task["minutes"]
+                moved = True
+            while right and loads[i] + right[0]["minutes"] < loads[i + 1]:
+                task = right.pop(0)
+                left.append(task)
+                loads[i] += task["minutes"]
+                loads[i + 1] -= task["minutes"]
+                moved = True
+    return sheets
+
+
+def plan_hsk_assignments(tasks: list, attendants: int) -> list:
+    """Split the open tasks into `attendants` sheets of contiguous rooms and floors.
+
+    The tasks are walked in room order and cut at the smallest per-sheet
+    load that fits in `attendants` runs (binary search over the load), then
+    neighbouring sheets are evened out. Each task gets its "minutes".
+    """
+    route = sorted(
+        (dict(t, minutes=hsk_task_minutes(t)) for t in tasks if t.get("Status") != "DONE"),
+        key=_hsk_route_key,
+    )
+    if attendants < 1:
+        return []
+    if not route:
+        return [[] for _ in range(attendants)]
+
+    def runs_needed(capacity):
+        runs, load = 1, 0
+        for task in route:
+            if load + task["minutes"] > capacity:
+                runs, load = runs + 1, 0
+            load += task["minutes"]
+        return runs
+
+    low, high = max(t["minutes"] for t in route), sum(t["minutes"] for t in route)
+    while low < high:
+        mid = (low + high) // 2
+        if runs_needed(mid) <= attendants:
+            high = mid
+        else:
+            low = mid + 1
+
+    sheets, load = [[]], 0
+    for task in route:
+        if sheets[-1] and load + task["minutes"] > low:
+            sheets.append([])
+            load = 0
+        sheets[-1].append(task)
+        load += task["minutes"]
+    sheets += [[] for _ in range(attendants - len(sheets))]
+    return _balance_hsk_sheets(sheets)
+
+
+def replan_hsk_assignments(sheets: list, tasks: list) -> list:
+    """Bring a plan up to date with the board without starting over.
+
+    DONE tasks leave their sheet, tasks new to the board join the sheet
+    whose rooms they fall between, and only neighbouring sheets rebalance,
+    so attendants keep the rooms they already have.
+    """
+    current = {(t["room"], t["tasktype"]): t for t in tasks if t.get("Status") != "DONE"}
+    planned = set()
+    updated = []
+    for sheet in sheets:
+        kept = []
+        for task in sheet:
+            key = (task["room"], task["tasktype"])
+            if key in current:
+                kept.append(dict(current[key], minutes=hsk_task_minutes(current[key])))
+                planned.add(key)
+        updated.append(kept)
+
+    for key, task in current.items():
+        if key in planned:
+            continue
+        task = dict(task, minutes=hsk_task_minutes(task))
+        route_key = _hsk_route_key(task)
+        # First sheet whose last room comes after this one, else the last non-empty sheet
+        target = next(
+            (sheet for sheet in updated if sheet and _hsk_route_key(sheet[-1]) >= route_key),
+            next((sheet for sheet in reversed(updated) if sheet), updated[0] if updated else None),
+        )
+        if target is None:
+            continue
+        target.append(task)
+        target.sort(key=_hsk_route_key)
+    return _balance_hsk_sheets(updated)
+
+
+# reservations columns in the reservations_fts full-text index, and the
+# field names a search may use to restrict a term ("guest:smith channel:book")
+FTS_COLUMNS = (
+    "guest_name", "room_number", "reservation_no", "main_client", "channel",
+    "main_remark", "total_remarks", "contact_name", "contact_phone", "contact_email",
+)
+SEARCH_FIELDS = {
+    "guest": ("guest_name",),
+    "name": ("guest_name",),
+    "room": ("room_number",),
+    "res": ("reservation_no",),
+    "client": ("main_client",),
+    "channel": ("channel",),
+    "remark": ("main_remark", "total_remarks"),
+    "contact": ("contact_name", "contact_phone", "contact_email"),
+    "email": ("contact_email",),
+    "phone": ("contact_phone",),
+}
+_SEARCH_TERM = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+
+def fts_match_query(q: str, columns: tuple = None):
+    """FTS5 MATCH expression for a search box entry, or None if it has no words.
+
+    Every term must match as a word prefix. `field:term` restricts a term to
+    SEARCH_FIELDS[field] (or a FTS_COLUMNS name), `columns` restricts all
+    terms. A term limited to room_number matches the whole canonical number
+    (room:101 finds 101, not 1012). Terms are quoted, so FTS5 operators
+    typed in the box are plain text.
+    """
+    parts = []
+    for field, term in _SEARCH_TERM.findall(q or ""):
+        term_columns = columns
+        if field:
+            field_columns = SEARCH_FIELDS.get(field.lower()) or (
+                (field.lower(),) if field.lower() in FTS_COLUMNS else None
+            )
+            if field_columns is None:
+                term = f"{field}:{term}"  # e.g. a time, not a field name
+            else:
+                term_columns = field_columns
+        term = term.strip('"')
+        if not re.search(r"\w", term):
+            continue
+        exact = term_columns == ("room_number",)
+        if exact:
+            term = canonical_number(term)
+        phrase = '"' + term.replace('"', '""') + ('"' if exact else '"*')
+        if term_columns:
+            phrase = "{" + " ".join(term_columns) + "} : " + phrase
+        parts.append(phrase)
+    return " AND ".join(parts) or None
+
+
+def day_bounds(d) -> tuple:
+    """Half-open [day, next day) ISO bounds for a date.
+
+    Dates are stored as ISO TEXT, sometimes with a time part, so
+    `col >= start AND col < end` matches the whole day and, unlike
+    date(col) = date(?), lets SQLite use an index on col.
+    """
+    if isinstance(d, datetime):
+        d = d.date()
+    elif not isinstance(d, date):
+        d = date.fromisoformat(str(d)[:10])
+    return d.isoformat(), (d + timedelta(days=1)).isoformat()
+
+
+# Remark classifier: flag column -> pattern searched (case-insensitive) in the
+# remarks. Compiled once; the flags are stored so pages never scan remark text.
+REMARK_RULES = (
+    ("flag_twin", r"2t"),
+    ("flag_vip", r"vip|birthday"),
+    ("flag_accessible", r"accessible|disabled"),
+    ("flag_parking", r"parking|poa"),
+)
+REMARK_PATTERNS = tuple((flag, re.compile(pattern, re.IGNORECASE)) for flag, pattern in REMARK_RULES)
+REMARK_FLAGS = tuple(flag for flag, _ in REMARK_RULES)
+
+
+def remark_flags(*remarks) -> dict:
+    """Flag columns (0/1) for one row's remark texts."""
+    text = " ".join(r for r in remarks if r)
+    return {flag: int(bool(pattern.search(text))) for flag, pattern in REMARK_PATTERNS}
+
+
+def classify_remarks(text: pd.Series) -> pd.DataFrame:
+    """Vectorised remark_flags for a column of remark text."""
+    text = text.astype("string").fillna("")
+    return pd.DataFrame(
+        {flag: text.str.contains(pattern).astype(int) for flag, pattern in REMARK_PATTERNS},
+        index=text.index,
+    )
+
+
+def changed_rows(original: pd.DataFrame, edited: pd.DataFrame, columns) -> pd.DataFrame:
+    """Rows of a st.data_editor result whose `columns` differ from the original.
+
+    Rows are matched on the index, which data_editor keeps for fixed-size
+    tables; blank-to-blank (None/NaN) is not treated as a change. Blanks in
+    the returned rows are None, ready to be bound as SQL parameters.
+    """
+    columns = list(columns)
+    if edited.empty:
+        return edited
+    before = original.reindex(edited.index)[columns].astype(object)
+    after = edited[columns].astype(object)
+    differs = (before != after) & ~(before.isna() & after.isna())
+    changed = edited[differs.any(axis=1)].astype(object)
+    return changed.where(changed.notna(), None)
+
+
+# reservations column -> PMS "Arrivals" export header. Only these columns are
+# ever loaded; a changed export layout only needs a different mapping.
+ARRIVALS_COLUMN_MAP = {
+    "arrival_date": "Arrival Date",
+    "depart_date": "Depart",
+    "room_number": "Room",
+    "room_type_code": "Room type",
+    "adults": "AD",
+    "total_guests": "Tot. guests",
+    "reservation_no": "Reservation No.",
+    "voucher": "Voucher",
+    "guest_name": "Guest or Group's name",
+    "main_client": "Main client",
+    "nights": "Nights",
+    "meal_plan": "Meal Plan",
+    "rate_code": "Rate",
+    "channel": "Chanl",
+    "main_remark": "Main Rem.",
+    "contact_name": "Contact person",
+    "contact_email": "E-mail",
+    "source_of_business": "Source of Business",
+}
+ARRIVALS_DATE_FIELDS = ("arrival_date", "depart_date")
+
+
+def load_arrivals_mapping(path: str = ARRIVALS_MAPPING_FILE) -> dict:
+    """ARRIVALS_COLUMN_MAP with the overrides from `path`, if that file exists."""
+    mapping = dict(ARRIVALS_COLUMN_MAP)
+    if not path or not os.path.exists(path):
+        return mapping
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    unknown = sorted(set(overrides) - set(mapping))
+    if unknown:
+        raise ValueError(f"{path}: unknown reservations column(s): {', '.join(unknown)}")
+    mapping.update({field: str(header).strip() for field, header in overrides.items()})
+    return mapping
+
+
+# The exports are day-first (15.01.2026); never let a parser guess month-first
+PMS_DATE_FORMATS = ("%d.%m.%Y", "%d/%m/%Y", "%d.%m.%y", "%d/%m/%y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S")
+
+
+def parse_pms_date(value):
+    """datetime for an export date cell (a datetime, or day-first text); None if blank or invalid."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    if not text or text.lower() in ("nan", "nat", "none"):
+        return None
+    for fmt in PMS_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _pms_dates(series) -> pd.Series:
+    if series is None:
+        return pd.Series(dtype="datetime64[ns]")
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series.map(parse_pms_date, na_action="ignore"), errors="coerce")
+
+
+class ArrivalsSource(abc.ABC):
+    """One PMS arrivals export, read in chunks of rows.
+
+    Subclasses implement raw_chunks(), yielding frames with the export's own
+    headers (mapped columns only, blanks as None, dates parsed day-first);
+    batches() maps each chunk through parse_arrivals_frame, so every format
+    produces the same reservations rows.
+    """
+    extensions = ()
+    # Imported chunk by chunk (constant memory) instead of parsed whole in the pool
+    streamed = False
+
+    def __init__(self, path: str, mapping: dict = None):
+        self.path = path
+        self.mapping = mapping or load_arrivals_mapping()
+
+    @abc.abstractmethod
+    def raw_chunks(self, chunk_rows: int):
+        """Yield the export's rows as frames of at most `chunk_rows` rows."""
+
+    def batches(self, chunk_rows: int = IMPORT_BATCH_ROWS):
+        for chunk in self.raw_chunks(chunk_rows):
+            yield parse_arrivals_frame(chunk, self.mapping)
+
+    def read(self) -> pd.DataFrame:
+        frames = list(self.batches())
+        if not frames:
+            return parse_arrivals_frame(pd.DataFrame(columns=list(self.mapping.values())), self.mapping)
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _locate(self, header) -> dict:
+        """Export header -> column position, for the mapped headers present."""
+        wanted = set(self.mapping.values())
+        positions = {}
+        for index, name in enumerate(header):
+            name = str(name).strip() if name is not None else ""
+            if name in wanted and name not in positions:
+                positions[name] = index
+        missing = [self.mapping[field] for field in ARRIVALS_DATE_FIELDS if self.mapping[field] not in positions]
+        if missing:
+            raise ValueError(f"Not an arrivals export, missing column(s): {', '.join(missing)}")
+        return positions
+
+    def _parse_dates(self, columns: dict) -> pd.DataFrame:
+        for field in ARRIVALS_DATE_FIELDS:
+            name = self.mapping[field]
+            columns[name] = pd.to_datetime([parse_pms_date(v) for v in columns[name]])
+        return pd.DataFrame(columns)
+
+
+class XlsxArrivalsSource(ArrivalsSource):
+    """openpyxl read-only mode: the sheet is parsed row by row and header
+    positions are found once, so memory stays bounded by one chunk."""
+    extensions = (".xlsx",)
+
+    def raw_chunks(self, chunk_rows: int):
+        wb = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            positions = self._locate(next(rows, None) or ())
+            wanted = list(positions.items())
+            columns = {name: [] for name in positions}
+            count = 0
+            for row in rows:
+                width = len(row)
+                for name, index in wanted:
+                    value = row[index] if index < width else None
+                    if isinstance(value, str):
+                        value = value if value.strip() else None
+                    columns[name].append(value)
+                count += 1
+                if count == chunk_rows:
+                    yield self._parse_dates(columns)
+                    columns = {name: [] for name in positions}
+                    count = 0
+            if count:
+                yield self._parse_dates(columns)
+        finally:
+            wb.close()
+
+
+class CsvArrivalsSource(ArrivalsSource):
+    """pandas' chunked CSV reader; everything is read as text and parsed by
+    parse_arrivals_frame, like the workbook cells."""
+    extensions = (".csv",)
+    streamed = True
+
+    def raw_chunks(self, chunk_rows: int):
+        header = pd.read_csv(self.path, nrows=0, encoding="utf-8-sig").columns
+        positions = self._locate(header)
+        reader = pd.read_csv(
+            self.path,
+            usecols=sorted(positions.values()),
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunk_rows,
+            encoding="utf-8-sig",
+        )
+        with reader:
+            for chunk in reader:
+                chunk.columns = [str(c).strip() for c in chunk.columns]
+                yield self._parse_dates({
+                    name: [value.strip() or None for value in chunk[name].tolist()]
+                    for name in positions
+                })
+
+
+ARRIVALS_SOURCES = (XlsxArrivalsSource, CsvArrivalsSource)
+ARRIVALS_EXTENSIONS = tuple(ext for source in ARRIVALS_SOURCES for ext in source.extensions)
+
+
+def open_arrivals_source(path: str, mapping: dict = None) -> ArrivalsSource:
+    """The adapter for an export, chosen by file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    for source in ARRIVALS_SOURCES:
+        if extension in source.extensions:
+            return source(path, mapping)
+    raise ValueError(f"No arrivals adapter for '{extension}' files")
+
+
+def parse_arrivals_frame(df: pd.DataFrame, mapping: dict = None) -> pd.DataFrame:
+    """Map one PMS arrivals export to reservations columns (headers per `mapping`)."""
+    df.columns = [str(c).strip() for c in df.columns]
+    mapping = mapping or ARRIVALS_COLUMN_MAP
+
+    def col(field):
+        return df.get(mapping[field])
+
+    # Simple mapping - keep everything as strings initially
+    df_clean = pd.DataFrame({
+        "arrival_date": _pms_dates(col("arrival_date")),
+        "depart_date": _pms_dates(col("depart_date")),
+        "room_number": canonical_number_series(col("room_number")),
+        "room_type_code": col("room_type_code"),
+        "adults": pd.to_numeric(col("adults"), errors='coerce').fillna(1).astype(int),
+        "children": 0,
+        "total_guests": pd.to_numeric(col("total_guests"), errors='coerce').fillna(1).astype(int),
+        "reservation_no": canonical_number_series(col("reservation_no")),
+        "voucher": col("voucher").astype(str) if mapping["voucher"] in df.columns else None,
+        "guest_name": col("guest_name"),
+        "main_client": col("main_client"),
+        "nights": pd.to_numeric(col("nights"), errors='coerce'),
+        "meal_plan": col("meal_plan"),
+        "rate_code": col("rate_code"),
+        "channel": col("channel"),
+        "main_remark": col("main_remark"),
+        "contact_name": col("contact_name"),
+        "contact_email": col("contact_email"),
+        "source_of_business": col("source_of_business"),
+    })
+    
+    # Store planned dates as ISO date-only text
+    df_clean["arrival_date"] = df_clean["arrival_date"].dt.strftime("%Y-%m-%d")
+    df_clean["depart_date"] = df_clean["depart_date"].dt.strftime("%Y-%m-%d")
+    
+    # Replace remaining NaT/NaN with None
+    df_clean = df_clean.where(pd.notna(df_clean), None)
+    
+    return df_clean
+
+
+def validate_arrivals_frame(df: pd.DataFrame):
+    """Split parsed arrivals rows into (clean rows, rejected rows with a reason), column-wise.
+
+    Spacer rows with no dates, number, name or room are dropped. A rejected
+    row carries the first rule it failed.
+    """
+    df = df[df[["arrival_date", "depart_date", "reservation_no", "guest_name", "room_number"]].notna().any(axis=1)]
+    reason = pd.Series(pd.NA, index=df.index, dtype="string")
+
+    def reject(mask, why):
+        mask = mask.fillna(False).astype(bool) & reason.isna()
+        reason[mask] = why[mask] if isinstance(why, pd.Series) else why
+
+    arrival = pd.to_datetime(df["arrival_date"], errors="coerce", format="%Y-%m-%d")
+    depart = pd.to_datetime(df["depart_date"], errors="coerce", format="%Y-%m-%d")
+    reject(df["reservation_no"].isna(), "reservation number missing")
+    reject(arrival.isna() | depart.isna(), "arrival or departure date missing or invalid")
+    reject(depart < arrival, "departure before arrival")
+
+    span = (depart - arrival).dt.days.astype("Int64")
+    nights = pd.to_numeric(df["nights"], errors="coerce")
+    reject(
+        nights.notna() & (nights != span),
+        "nights " + nights.round().astype("Int64").astype("string") + " but the dates span " + span.astype("string"),
+    )
+    adults = pd.to_numeric(df["adults"], errors="coerce")
+    guests = pd.to_numeric(df["total_guests"], errors="coerce")
+    reject((adults < 1) | (guests < 1), "guest count is 0")
+
+    valid_rooms = {str(rn) for start, end in ROOM_BLOCKS for rn in range(start, end + 1)}
+    room = df["room_number"].astype("string")
+    reject(room.notna() & ~room.isin(valid_rooms), "room " + room + " is not in ROOM_BLOCKS")
+
+    ok = reason.isna()
+    rejected = df[~ok].copy()
+    rejected.insert(0, "reason", reason[~ok].astype(object))
+    return df[ok], rejected
+
+
+def _parse_cache_path(sha256: str, mapping: dict = None, cache_dir: str = None) -> str:
+    # A different column mapping parses the same file differently
+    digest = hashlib.sha256(json.dumps(mapping or ARRIVALS_COLUMN_MAP, sort_keys=True).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir or PARSE_CACHE_DIR, f"{sha256}-v{ARRIVALS_PARSER_VERSION}-{digest}.parquet")
+
+
+def load_cached_arrivals(sha256: str, mapping: dict = None, cache_dir: str = None):
+    """Parsed frame for a file hash from the cache, or None on a miss."""
+    path = _parse_cache_path(sha256, mapping, cache_dir)
+    try:
+        df = pd.read_parquet(path)
+        os.utime(path)  # eviction drops the least recently used entries first
+    except (OSError, ValueError):
+        return None
+    return df.astype(object).where(df.notna(), None)
+
+
+def store_cached_arrivals(sha256: str, df: pd.DataFrame, mapping: dict = None, cache_dir: str = None):
+    """Write a parsed frame to the cache; any failure just means a later miss."""
+    path = _parse_cache_path(sha256, mapping, cache_dir)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def evict_parse_cache(max_mb: float = PARSE_CACHE_MAX_MB, max_age_days: float = PARSE_CACHE_MAX_AGE_DAYS) -> dict:
+    """Drop cache entries unused for max_age_days, then the oldest until under max_mb."""
+    if not os.path.isdir(PARSE_CACHE_DIR):
+        return {"files": 0, "mb": 0.0, "evicted": 0}
+    entries = []
+    for entry in os.scandir(PARSE_CACHE_DIR):
+        if entry.is_file():
+            info = entry.stat()
+            entries.append((info.st_mtime, info.st_size, entry.path))
+    entries.sort()
+
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_mb * 1024 * 1024:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    return {"files": len(entries) - evicted, "mb": round(total / 1024 / 1024, 1), "evicted": evicted}
+
+
+def parse_arrivals_workbook(path: str, sha256: str = None, mapping: dict = None, cache_dir: str = None):
+    """Read and map one arrivals export whole: (path, frame, None) or (path, None, error).
+
+    With the file's content hash the parsed frame is served from, or saved
+    to, cache_dir (default PARSE_CACHE_DIR). Module level so a process pool
+    can run it; the pool passes the parent's cache_dir along.
+    """
+    try:
+        mapping = mapping or load_arrivals_mapping()
+        if sha256:
+            cached = load_cached_arrivals(sha256, mapping, cache_dir)
+            if cached is not None:
+                return path, cached, None
+        df = open_arrivals_source(path, mapping).read()
+        if sha256:
+            store_cached_arrivals(sha256, df, mapping, cache_dir)
+        return path, df, None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+class _ConnectionLease:
+    """Ties a pooled connection to the thread that leased it."""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections, one leased per thread.
+
+    Streamlit runs each script run on its own thread, so the first query on a
+    thread leases a connection and every later query on that thread reuses it.
+    When the thread finishes its thread-local lease is collected and the
+    connection goes back to the idle list for the next run.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -16000",    # ~16 MB page cache per connection
+        "PRAGMA mmap_size = 134217728",  # 128 MB memory-mapped reads
+        "PRAGMA temp_store = MEMORY",
+    )
+
+    def __init__(self, dbpath: str, max_size: int = 8, busy_timeout: float = 5.0, acquire_timeout: float = 30.0):
+        self.dbpath = dbpath
+        self.max_size = max_size
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.dbpath, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Return the calling thread's connection, leasing one if needed."""
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            return lease.conn
+
+        started = time.perf_counter()
+        waited = False
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                waited = True
+                remaining = self.acquire_timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No free database connection after {self.acquire_timeout:.0f}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._acquired += 1
+            if waited:
+                wait = time.perf_counter() - started
+                self._waits += 1
+                self._wait_time += wait
+                self._max_wait = max(self._max_wait, wait)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        lease = _ConnectionLease(conn)
+        weakref.finalize(lease, self._release, conn)
+        self._local.lease = lease
+        return conn
+
+    def release(self):
+        """Hand the calling thread's connection back before the thread ends."""
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            del self._local.lease
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                self._open -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        """Close idle connections now and in-use ones as they are released."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "total_wait_ms": round(self._wait_time * 1000, 1),
+                "max_wait_ms": round(self._max_wait * 1000, 1),
+            }
+
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SQL_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and replace literals with ? so one statement is one key."""
+    query = _SQL_STRING.sub("?", query)
+    query = _SQL_NUMBER.sub("?", query)
+    return _SQL_SPACE.sub(" ", query).strip()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class QueryProfiler:
+    """Timings for every statement run through FrontOfficeDB's query helpers.
+
+    Off unless FrontOfficeDB.profiler is set, so the helpers pay one
+    attribute check. Statements slower than slow_ms are appended to
+    log_path as JSON lines together with their EXPLAIN QUERY PLAN.
+    """
+
+    # Frames skipped when looking for the method that issued the query
+    _HELPERS = frozenset({
+        "fetch_all", "fetch_one", "execute", "executemany", "transaction",
+        "__enter__", "__exit__", "_timed", "record",
+    })
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, log_path: str = SLOW_QUERY_LOG, samples: int = 1000, renders: int = 20):
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._times = defaultdict(lambda: deque(maxlen=samples))
+        self._rows = Counter()
+        self._calls = Counter()
+        self._callers = defaultdict(Counter)
+        self._renders = deque(maxlen=renders)
+        self._slow = deque(maxlen=100)
+        self._local = threading.local()
+
+    @staticmethod
+    def _caller() -> str:
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_code.co_name in QueryProfiler._HELPERS:
+            frame = frame.f_back
+        return frame.f_code.co_name if frame is not None else "?"
+
+    def begin_render(self, page: str):
+        """Start counting statements for one page render on this thread."""
+        render = {"page": page, "started": datetime.now().strftime("%H:%M:%S"), "calls": Counter(), "ms": 0.0}
+        self._local.render = render
+        with self._lock:
+            self._renders.append(render)
+
+    def record(self, conn, query: str, params, elapsed: float, rows: int):
+        ms = elapsed * 1000
+        sql = normalize_sql(query)
+        caller = self._caller()
+        render = getattr(self._local, "render", None)
+        with self._lock:
+            self._times[sql].append(ms)
+            self._calls[sql] += 1
+            self._rows[sql] += rows
+            self._callers[sql][caller] += 1
+            # render_stats reads these from another thread
+            if render is not None:
+                render["calls"][sql] += 1
+                render["ms"] += ms
+        if ms >= self.slow_ms:
+            self._log_slow(conn, query, params, sql, caller, ms, rows)
+
+    def _log_slow(self, conn, query, params, sql, caller, ms, rows):
+        try:
+            plan_rows = conn.execute(
+                "EXPLAIN QUERY PLAN " + query, () if params is None else params
+            ).fetchall()
+            plan = [row[-1] for row in plan_rows]
+        except sqlite3.Error as e:
+            plan = [f"(no plan: {e})"]
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "ms": round(ms, 2),
+            "rows": rows,
+            "caller": caller,
+            "sql": sql,
+            "plan": plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+            if self.log_path:
                 try:
-                    c.execute("ALTER TABLE no_shows ADD COLUMN amount_pending REAL")
-                except sqlite3.OperationalError:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError:
                     pass
 
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS payments (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        reservation_id INTEGER,
-                        guest_name TEXT,
-                        amount REAL,
-                        type TEXT,               -- PAYMENT or REFUND
-                        method TEXT,             -- card / cash / etc.
-                        reference TEXT,          -- PMS folio ref, POS ref
-                        note TEXT,
-                        created_at TEXT DEFAULT (datetime('now')),
-                        FOREIGN KEY (reservation_id) REFERENCES reservations(id)
-                    )
-                """)
+    def statement_stats(self) -> list:
+        """Per-statement calls, rows and p50/p95/p99/max in ms, slowest p95 first."""
+        with self._lock:
+            snapshot = [
+                (sql, sorted(times), self._calls[sql], self._rows[sql], self._callers[sql].most_common(1)[0][0])
+                for sql, times in self._times.items()
+            ]
+        stats = [
+            {
+                "sql": sql,
+                "caller": caller,
+                "calls": calls,
+                "rows": rows,
+                "p50_ms": round(_percentile(times, 0.50), 2),
+                "p95_ms": round(_percentile(times, 0.95), 2),
+                "p99_ms": round(_percentile(times, 0.99), 2),
+                "max_ms": round(times[-1], 2),
+                "total_ms": round(sum(times), 1),
+            }
+            for sql, times, calls, rows, caller in snapshot
+        ]
+        return sorted(stats, key=lambda s: s["p95_ms"], reverse=True)
+
+    def render_stats(self) -> list:
+        """Statement counts of the most recent page renders, newest first."""
+        with self._lock:
+            return [
+                {
+                    "started": r["started"],
+                    "page": r["page"],
+                    "statements": sum(r["calls"].values()),
+                    "distinct": len(r["calls"]),
+                    "ms": round(r["ms"], 1),
+                }
+                for r in reversed(self._renders)
+            ]
 
+    def slow_queries(self) -> list:
+        with self._lock:
+            return list(reversed(self._slow))
 
-                c.execute("""
-                    CREATE TABLE IF NOT EXISTS spare_rooms (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        target_date TEXT,
-                        room_number TEXT
-                    )
-                """)
-                c.execute("""
-    CREATE TABLE IF NOT EXISTS hsk_task_status (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        task_date TEXT,
-        room_number TEXT,
-        task_type TEXT,
-        status TEXT DEFAULT 'PENDING',
-        notes TEXT,
-        updated_at TEXT DEFAULT (datetime('now')),
-        UNIQUE(task_date, room_number, task_type)
+    def reset(self):
+        with self._lock:
+            self._times.clear()
+            self._rows.clear()
+            self._calls.clear()
+            self._callers.clear()
+            self._renders.clear()
+            self._slow.clear()
+
+
+# =========================
+# Schema migrations
+# =========================
+# Each step runs once, in order, inside its own transaction and bumps
+# PRAGMA user_version. Add new steps to the end of MIGRATIONS; never edit
+# or reorder a step that has already shipped.
+
+def _table_columns(c, table: str) -> set:
+    return {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column_if_missing(c, table: str, column: str, decl: str):
+    if column not in _table_columns(c, table):
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _migrate_base_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount_pending REAL,
+            arrival_date TEXT,
+            depart_date TEXT,
+            room_number TEXT,
+            room_type_code TEXT,
+            adults INTEGER,
+            children INTEGER,
+            total_guests INTEGER,
+            reservation_no TEXT,
+            front_office_notes TEXT,
+            voucher TEXT,
+            related_reservation TEXT,
+            crs_code TEXT,
+            crs_name TEXT,
+            guest_id_raw TEXT,
+            guest_name TEXT,
+            vip_flag TEXT,
+            client_id TEXT,
+            main_client TEXT,
+            nights INTEGER,
+            meal_plan TEXT,
+            rate_code TEXT,
+            channel TEXT,
+            cancellation_policy TEXT,
+            main_remark TEXT,
+            contact_name TEXT,
+            contact_phone TEXT,
+            contact_email TEXT,
+            total_remarks TEXT,
+            source_of_business TEXT,
+            stay_option_desc TEXT,
+            remarks_by_chain TEXT,
+            reservation_group_id TEXT,
+            reservation_group_name TEXT,
+            company_name TEXT,
+            company_id_raw TEXT,
+            country TEXT,
+            reservation_status TEXT DEFAULT 'CONFIRMED',
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS stays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER,
+            room_number TEXT,
+            status TEXT DEFAULT 'EXPECTED',
+            checkin_planned TEXT,
+            checkout_planned TEXT,
+            checkin_actual TEXT,
+            checkout_actual TEXT,
+            breakfast_code TEXT,
+            comment TEXT,
+            parking_space TEXT,
+            parking_plate TEXT,
+            parking_notes TEXT,
+            FOREIGN KEY (reservation_id) REFERENCES reservations(id)
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rooms (
+            room_number TEXT PRIMARY KEY,
+            room_type TEXT,
+            floor INTEGER,
+            status TEXT DEFAULT 'VACANT',
+            is_twin INTEGER DEFAULT 0
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_date TEXT,
+            title TEXT,
+            created_by TEXT,
+            assigned_to TEXT,
+            comment TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS no_shows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            arrival_date TEXT,
+            guest_name TEXT,
+            main_client TEXT,
+            charged INTEGER,
+            amount_charged REAL,
+            amount_pending REAL,
+            comment TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_no INTEGER UNIQUE,
+            reservation_id INTEGER,
+            guest_name TEXT,
+            room_number TEXT,
+            total_net REAL,
+            total_vat REAL,
+            total_amount REAL,
+            invoice_date TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (reservation_id) REFERENCES reservations(id)
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER,
+            guest_name TEXT,
+            amount REAL,
+            type TEXT,               -- PAYMENT or REFUND
+            method TEXT,             -- card / cash / etc.
+            reference TEXT,          -- PMS folio ref, POS ref
+            note TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (reservation_id) REFERENCES reservations(id)
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS spare_rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_date TEXT,
+            room_number TEXT
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS hsk_task_status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_date TEXT,
+            room_number TEXT,
+            task_type TEXT,
+            status TEXT DEFAULT 'PENDING',
+            notes TEXT,
+            updated_at TEXT DEFAULT (datetime('now')),
+            UNIQUE(task_date, room_number, task_type)
+        )
+    """)
+
+
+def _migrate_legacy_columns(c):
+    # Databases created before these columns existed
+    _add_column_if_missing(c, "reservations", "front_office_notes", "TEXT")
+    _add_column_if_missing(c, "no_shows", "amount_charged", "REAL")
+    _add_column_if_missing(c, "no_shows", "amount_pending", "REAL")
+
+
+def _migrate_daily_list_indexes(c):
+    # Daily lists filter on raw date columns with half-open ranges (see day_bounds)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_arrival ON reservations(arrival_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_depart ON reservations(depart_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_room_dates ON reservations(room_number, arrival_date, depart_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stays_reservation ON stays(reservation_id, status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stays_status_checkout ON stays(status, checkout_planned)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stays_status_checkout_actual ON stays(status, checkout_actual)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_no_shows_arrival ON no_shows(arrival_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_payments_reservation ON payments(reservation_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks(task_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_spare_rooms_date ON spare_rooms(target_date)")
+    c.execute("ANALYZE")
+
+
+def _canonical_number_sql(col: str) -> str:
+    # SQL twin of canonical_number(), used to backfill rows written before it existed
+    return f"""CASE
+        WHEN {col} IS NULL OR trim({col}) IN ('', 'nan', 'NaN', 'None', '<NA>') THEN NULL
+        WHEN trim({col}) GLOB '[0-9]*' AND trim({col}) NOT GLOB '*[^0-9.]*'
+             AND CAST(trim({col}) AS REAL) = CAST(CAST(trim({col}) AS REAL) AS INTEGER)
+            THEN CAST(CAST(trim({col}) AS REAL) AS INTEGER)
+        ELSE trim({col})
+    END"""
+
+
+def _iso_date_sql(col: str) -> str:
+    # pandas wrote missing dates as 'NaT'; those become NULL, other text is kept
+    return f"""CASE
+        WHEN trim({col}) IN ('', 'NaT', 'nan', 'NaN', 'None') THEN NULL
+        WHEN {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr({col}, 1, 10)
+        ELSE {col}
+    END"""
+
+
+ROOM_KEY_TABLES = ("reservations", "stays", "rooms", "spare_rooms")
+
+
+def _migrate_canonical_storage(c):
+    # Room / reservation numbers as canonical text ('302', not '302.0')
+    for table in ("reservations", "stays", "spare_rooms"):
+        c.execute(f"UPDATE {table} SET room_number = {_canonical_number_sql('room_number')}")
+    c.execute(f"UPDATE OR IGNORE hsk_task_status SET room_number = {_canonical_number_sql('room_number')}")
+    c.execute(f"UPDATE OR IGNORE rooms SET room_number = {_canonical_number_sql('room_number')}")
+    c.execute(f"DELETE FROM rooms WHERE room_number IS NOT {_canonical_number_sql('room_number')}")
+    c.execute(f"UPDATE reservations SET reservation_no = {_canonical_number_sql('reservation_no')}")
+
+    # Planned dates as ISO date-only; actual check-in/out times keep their timestamps
+    c.execute(f"""
+        UPDATE reservations
+        SET arrival_date = {_iso_date_sql('arrival_date')},
+            depart_date = {_iso_date_sql('depart_date')}
+    """)
+    c.execute(f"""
+        UPDATE stays
+        SET checkin_planned = {_iso_date_sql('checkin_planned')},
+            checkout_planned = {_iso_date_sql('checkout_planned')}
+    """)
+
+    # Empty "total" rows that older imports let through as NaT/NaN
+    c.execute("""
+        DELETE FROM reservations
+        WHERE arrival_date IS NULL AND depart_date IS NULL
+        AND guest_name IS NULL AND reservation_no IS NULL
+        AND id NOT IN (SELECT reservation_id FROM stays WHERE reservation_id IS NOT NULL)
+    """)
+
+    # Integer sort key, kept in step with room_number by triggers
+    room_key = "CASE WHEN NEW.room_number GLOB '[0-9]*' THEN CAST(NEW.room_number AS INTEGER) END"
+    for table in ROOM_KEY_TABLES:
+        _add_column_if_missing(c, table, "room_key", "INTEGER")
+        c.execute(f"UPDATE {table} SET room_key = {room_key.replace('NEW.', '')}")
+        for event in ("INSERT", "UPDATE OF room_number"):
+            name = f"trg_{table}_room_key_{event.split()[0].lower()}"
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE {table} SET room_key = {room_key} WHERE rowid = NEW.rowid;
+                END
+            """)
+
+
+def _migrate_import_manifest(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            rows INTEGER,
+            status TEXT NOT NULL,
+            error TEXT,
+            imported_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _migrate_unique_reservation_no(c):
+    # Last main_remark seen in the PMS export; main_remark differing from it means FO edited it
+    _add_column_if_missing(c, "reservations", "pms_main_remark", "TEXT")
+    c.execute("UPDATE reservations SET pms_main_remark = main_remark")
+
+    # Re-imported daily files appended the same booking again. Keep one row per
+    # reservation_no, preferring the one the front office has worked on.
+    c.execute("""
+        CREATE TEMP TABLE reservation_dupes AS
+        WITH ranked AS (
+            SELECT r.id, r.reservation_no,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY r.reservation_no
+                       ORDER BY EXISTS (SELECT 1 FROM stays s WHERE s.reservation_id = r.id) DESC,
+                                r.room_number IS NOT NULL DESC,
+                                r.reservation_status IN ('NO_SHOW', 'CANCELLED') DESC,
+                                r.id DESC
+                   ) AS rank
+            FROM reservations r
+            WHERE r.reservation_no IS NOT NULL
+        )
+        SELECT dup.id AS dup_id, keep.id AS keep_id
+        FROM ranked dup
+        JOIN ranked keep ON keep.reservation_no = dup.reservation_no AND keep.rank = 1
+        WHERE dup.rank > 1
+    """)
+    # Every row of a duplicated booking, the kept one included, by kept id
+    c.execute("""
+        CREATE TEMP TABLE reservation_groups AS
+        SELECT keep_id, dup_id AS id FROM reservation_dupes
+        UNION
+        SELECT keep_id, keep_id FROM reservation_dupes
+    """)
+    c.execute("CREATE INDEX temp.idx_reservation_groups ON reservation_groups(keep_id)")
+
+    # What the front office set on a dropped row survives on the kept one: an
+    # assigned room, NO_SHOW / CANCELLED, and a main_remark edited away from
+    # the newest row's, which is taken as the PMS text.
+    group = """
+        FROM reservation_groups x JOIN reservations g ON g.id = x.id
+        WHERE x.keep_id = reservations.id
+    """
+    latest_remark = f"(SELECT g.main_remark {group} ORDER BY g.id DESC LIMIT 1)"
+    c.execute(f"""
+        UPDATE reservations
+        SET room_number = COALESCE(
+                room_number,
+                (SELECT g.room_number {group} AND g.room_number IS NOT NULL ORDER BY g.id DESC LIMIT 1)
+            ),
+            reservation_status = CASE
+                WHEN reservation_status IN ('NO_SHOW', 'CANCELLED') THEN reservation_status
+                ELSE COALESCE(
+                    (SELECT g.reservation_status {group} AND g.reservation_status IN ('NO_SHOW', 'CANCELLED')
+                     ORDER BY g.id DESC LIMIT 1),
+                    reservation_status
+                )
+            END,
+            main_remark = COALESCE(
+                (SELECT g.main_remark {group} AND g.main_remark IS NOT NULL AND g.main_remark IS NOT {latest_remark}
+                 ORDER BY g.id DESC LIMIT 1),
+                {latest_remark}
+            ),
+            pms_main_remark = {latest_remark}
+        WHERE id IN (SELECT keep_id FROM reservation_dupes)
+    """)
+
+    for table in ("stays", "payments", "invoices"):
+        c.execute(f"""
+            UPDATE {table}
+            SET reservation_id = (SELECT keep_id FROM reservation_dupes WHERE dup_id = {table}.reservation_id)
+            WHERE reservation_id IN (SELECT dup_id FROM reservation_dupes)
+        """)
+    c.execute("DELETE FROM reservations WHERE id IN (SELECT dup_id FROM reservation_dupes)")
+    c.execute("DROP TABLE reservation_groups")
+    c.execute("DROP TABLE reservation_dupes")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_reservation_no ON reservations(reservation_no)")
+
+
+def _migrate_reservation_changes(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS reservation_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            detected_at TEXT DEFAULT (datetime('now')),
+            source TEXT,
+            reservation_no TEXT NOT NULL,
+            change_type TEXT NOT NULL,
+            column_name TEXT,
+            old_value TEXT,
+            new_value TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservation_changes_no ON reservation_changes(reservation_no)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservation_changes_detected ON reservation_changes(detected_at)")
+    _add_column_if_missing(c, "reservations", "vanished_at", "TEXT")
+
+
+def _migrate_import_rejects(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS import_rejects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rejected_at TEXT DEFAULT (datetime('now')),
+            source TEXT,
+            reservation_no TEXT,
+            arrival_date TEXT,
+            guest_name TEXT,
+            room_number TEXT,
+            reason TEXT NOT NULL,
+            row_data TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_import_rejects_source ON import_rejects(source)")
+
+
+def _migrate_remark_flags(c):
+    for flag in REMARK_FLAGS:
+        _add_column_if_missing(c, "reservations", flag, "INTEGER NOT NULL DEFAULT 0")
+        # Partial indexes: only the few flagged rows are indexed
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_reservations_{flag} ON reservations({flag}) WHERE {flag} = 1")
+    _add_column_if_missing(c, "stays", "flag_parking", "INTEGER NOT NULL DEFAULT 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stays_flag_parking ON stays(flag_parking) WHERE flag_parking = 1")
+
+    reservations = pd.read_sql_query("SELECT id, main_remark, total_remarks FROM reservations", c.connection)
+    flags = classify_remarks(reservations["main_remark"].fillna("") + " " + reservations["total_remarks"].fillna(""))
+    c.executemany(
+        f"UPDATE reservations SET {', '.join(f'{flag} = ?' for flag in REMARK_FLAGS)} WHERE id = ?",
+        zip(*(flags[flag].tolist() for flag in REMARK_FLAGS), reservations["id"].tolist()),
     )
-""")
+    stays = pd.read_sql_query("SELECT id, comment FROM stays", c.connection)
+    c.executemany(
+        "UPDATE stays SET flag_parking = ? WHERE id = ?",
+        zip(classify_remarks(stays["comment"])["flag_parking"].tolist(), stays["id"].tolist()),
+    )
+
+
+def _migrate_reservations_fts(c):
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{col}" for col in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{col}" for col in FTS_COLUMNS)
+    try:
+        c.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS reservations_fts USING fts5(
+                {columns},
+                content = 'reservations', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search_reservations keeps using LIKE
+        if "fts5" not in str(e):
+            raise
+        return
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reservations_fts_insert AFTER INSERT ON reservations BEGIN
+            INSERT INTO reservations_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reservations_fts_delete AFTER DELETE ON reservations BEGIN
+            INSERT INTO reservations_fts (reservations_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reservations_fts_update AFTER UPDATE OF {columns} ON reservations BEGIN
+            INSERT INTO reservations_fts (reservations_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO reservations_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    """)
+    c.execute("INSERT INTO reservations_fts (reservations_fts) VALUES ('rebuild')")
+
+
+def _migrate_reservation_exported_at(c):
+    _add_column_if_missing(c, "reservations", "exported_at", "TEXT")
+
+
+MIGRATIONS = [
+    (1, "Base front office schema", _migrate_base_schema),
+    (2, "Add columns missing from older databases", _migrate_legacy_columns),
+    (3, "Indexes for the daily arrival, in-house and departure lists", _migrate_daily_list_indexes),
+    (4, "Canonical room numbers, reservation numbers and dates", _migrate_canonical_storage),
+    (5, "Manifest of imported arrivals files", _migrate_import_manifest),
+    (6, "One row per reservation number", _migrate_unique_reservation_no),
+    (7, "Change log of imported reservations", _migrate_reservation_changes),
+    (8, "Quarantine for arrivals rows that fail validation", _migrate_import_rejects),
+    (9, "Remark flag columns", _migrate_remark_flags),
+    (10, "Full-text search index on reservations", _migrate_reservations_fts),
+    (11, "Export time of the file each reservation was last imported from", _migrate_reservation_exported_at),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class FrontOfficeDB:
+    def init_db(self):
+        self.migrate()
+        self._check_fts()
+
+    def schema_version(self) -> int:
+        return self.fetch_one("PRAGMA user_version")["user_version"]
+
+    def pending_migrations(self) -> list:
+        """(version, description) of every migration not yet applied."""
+        current = self.schema_version()
+        return [(version, description) for version, description, _ in MIGRATIONS if version > current]
+
+    def migrate(self, dry_run: bool = False) -> list:
+        """Apply pending migrations in order, one transaction each.
+
+        With dry_run=True nothing is changed and the pending list is returned.
+        """
+        pending = self.pending_migrations()
+        if dry_run or not pending:
+            return pending
+
+        conn = self.get_conn()
+        for version, description, step in MIGRATIONS:
+            if version < pending[0][0]:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                step(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return pending
+
+    def ensure_schema(self):
+        """Cheap per-rerun check: one PRAGMA read when the schema is current."""
+        if self.schema_version() < SCHEMA_VERSION:
+            self.migrate()
+            self._check_fts()
+
     def update_arrival_comment(reservation_id: str, comment: str):
         # example – adjust to your schema/table
         try:
@@ -291,8 +1595,8 @@ class FrontOfficeDB:
                 r.depart_date  AS depart_date,
                 r.reservation_status AS reservation_status
             FROM reservations r
-            WHERE date(r.arrival_date) <= date(?)
-            AND date(r.depart_date)  >= date(?)
+            WHERE r.arrival_date < ?
+            AND r.depart_date >= ?
             AND r.meal_plan IS NOT NULL
             AND r.meal_plan != ''
             AND (
@@ -301,9 +1605,9 @@ class FrontOfficeDB:
                 OR lower(r.meal_plan) LIKE '%breakfast%'
             )
             AND r.reservation_status NOT IN ('CANCELLED', 'NO_SHOW')
-            ORDER BY CAST(r.room_number AS INTEGER)
+            ORDER BY r.room_key
             """,
-            (targetdate.isoformat(), targetdate.isoformat()),
+            (day_bounds(targetdate)[1], targetdate.isoformat()),
         )
     def add_reservation(
         self,
@@ -335,7 +1639,7 @@ class FrontOfficeDB:
             (
                 arrival.isoformat(),
                 depart.isoformat(),
-                room_number or None,
+                canonical_number(room_number),
                 guest_name,
                 main_client or None,
                 channel or None,
@@ -351,35 +1655,34 @@ class FrontOfficeDB:
             
     def cancel_noshow(self, noshow_id: int):
         """Cancel a no-show record and restore the reservation."""
-        # 1. Find the no-show row
-        ns = self.fetch_one(
-            "SELECT arrival_date, guest_name, main_client FROM no_shows WHERE id = ?",
-            (noshow_id,),
-        )
-        if not ns:
-            return False, "No-show record not found."
+        with self.transaction() as c:
+            # 1. Find the no-show row
+            ns = self.fetch_one(
+                "SELECT arrival_date, guest_name, main_client FROM no_shows WHERE id = ?",
+                (noshow_id,),
+            )
+            if not ns:
+                return False, "No-show record not found."
 
-        # 2. Find matching reservation (same guest + arrival date)
-        res = self.fetch_one(
-            """
-            SELECT id, room_number
-            FROM reservations
-            WHERE guest_name = ?
-            AND date(arrival_date) = date(?)
-            AND reservation_status = 'NO_SHOW'
-            ORDER BY created_at DESC
-            LIMIT 1
-            """,
-            (ns["guest_name"], ns["arrival_date"]),
-        )
-        if not res:
-            return False, "Matching reservation not found or not marked as NO_SHOW."
+            # 2. Find matching reservation (same guest + arrival date)
+            res = self.fetch_one(
+                """
+                SELECT id, room_number
+                FROM reservations
+                WHERE guest_name = ?
+                AND arrival_date >= ? AND arrival_date < ?
+                AND reservation_status = 'NO_SHOW'
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (ns["guest_name"], *day_bounds(ns["arrival_date"])),
+            )
+            if not res:
+                return False, "Matching reservation not found or not marked as NO_SHOW."
 
-        resid = res["id"]
-        room = res.get("room_number")
+            resid = res["id"]
+            room = res.get("room_number")
 
-        with closing(self.get_conn()) as conn, conn:
-            c = conn.cursor()
             # 3. Restore reservation status
             c.execute(
                 "UPDATE reservations SET reservation_status = 'CONFIRMED', updated_at = datetime('now') WHERE id = ?",
@@ -399,8 +1702,8 @@ class FrontOfficeDB:
     def update_stay_comment(self, stay_id: int, comment: str):
         """Update in-house stay comment (front office notes)."""
         self.execute(
-            "UPDATE stays SET comment = ? WHERE id = ?",
-            (comment, stay_id),
+            "UPDATE stays SET comment = ?, flag_parking = ? WHERE id = ?",
+            (comment, remark_flags(comment)["flag_parking"], stay_id),
         )
 
     def add_payment(self, reservation_id: int, guest_name: str, amount: float,
@@ -445,14 +1748,88 @@ class FrontOfficeDB:
                 s.checkout_planned AS depart_date
             FROM stays s
             JOIN reservations r ON r.id = s.reservation_id
-            WHERE date(s.checkin_planned) <= date(?)
-            AND date(s.checkout_planned) >= date(?)
-            AND s.status = 'CHECKED_IN'
+            WHERE s.status = 'CHECKED_IN'
+            AND s.checkout_planned >= ?
+            AND s.checkin_planned < ?
             ORDER BY r.guest_name
             """,
-            (d.isoformat(), d.isoformat()),
+            (d.isoformat(), day_bounds(d)[1]),
+        )
+
+
+    # ---- data_editor saves: only changed rows, one transaction ----
+
+    def save_mealplan_edits(self, original: pd.DataFrame, edited: pd.DataFrame) -> int:
+        """Persist edited "Meal Plan" cells of the in-house list."""
+        changed = changed_rows(original, edited, ["Meal Plan"])
+        return self.executemany(
+            "UPDATE reservations SET meal_plan = ?, updated_at = datetime('now') WHERE id = ?",
+            [
+                (row["Meal Plan"] or "", int(row["reservation_id"]))
+                for row in changed.to_dict("records")
+            ],
+        )
+
+    def save_room_status_edits(self, original: pd.DataFrame, edited: pd.DataFrame) -> int:
+        """Persist edited "Status" cells of the room list."""
+        changed = changed_rows(original, edited, ["Status"])
+        params = []
+        for row in changed.to_dict("records"):
+            status = (row["Status"] or "").upper().strip()
+            if status in ("CLEAN", "DIRTY", "VACANT", "OCCUPIED"):
+                params.append((status, canonical_number(row["Room"])))
+        return self.executemany("UPDATE rooms SET status = ? WHERE room_number = ?", params)
+
+    def save_task_edits(self, original: pd.DataFrame, edited: pd.DataFrame) -> int:
+        """Persist edited handover rows."""
+        columns = ["title", "created_by", "assigned_to", "comment"]
+        changed = changed_rows(original, edited, columns)
+        return self.executemany(
+            """
+            UPDATE tasks
+            SET title = ?, created_by = ?, assigned_to = ?, comment = ?
+            WHERE id = ?
+            """,
+            [
+                (row["title"], row["created_by"], row["assigned_to"], row["comment"], int(row["id"]))
+                for row in changed.to_dict("records")
+            ],
         )
 
+    def save_hsk_task_edits(self, task_date: date, original: pd.DataFrame, edited: pd.DataFrame) -> int:
+        """Persist edited Status / HSK Notes of the housekeeping list.
+
+        A checkout task newly marked DONE also sets its room to CLEAN, in the
+        same transaction.
+        """
+        changed = changed_rows(original, edited, ["Status", "HSK Notes"])
+        if changed.empty:
+            return 0
+
+        day = task_date.isoformat()
+        with self.transaction() as c:
+            c.executemany(
+                """
+                INSERT INTO hsk_task_status (task_date, room_number, task_type, status, notes, updated_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now'))
+                ON CONFLICT(task_date, room_number, task_type)
+                DO UPDATE SET status = excluded.status, notes = excluded.notes, updated_at = datetime('now')
+                """,
+                [
+                    (day, row["Room"], row["Type"], row["Status"], row["HSK Notes"] or "")
+                    for row in changed.to_dict("records")
+                ],
+            )
+            count = c.rowcount
+            c.executemany(
+                "UPDATE rooms SET status = 'CLEAN' WHERE room_number = ?",
+                [
+                    (row["Room"],)
+                    for row in changed.to_dict("records")
+                    if row["Type"] == "CHECKOUT" and row["Status"] == "DONE"
+                ],
+            )
+        return count
 
     def update_reservation_mealplan(self, reservation_id: int, meal_plan: str):
         """Update meal plan for a reservation (e.g., add breakfast)."""
@@ -475,12 +1852,12 @@ class FrontOfficeDB:
                 r.reservation_status AS reservation_status,
                 r.main_client     AS main_client
             FROM reservations r
-            WHERE date(r.arrival_date) <= date(?)
-            AND date(r.depart_date)  >= date(?)
+            WHERE r.arrival_date < ?
+            AND r.depart_date >= ?
             AND r.reservation_status NOT IN ('CANCELLED', 'NO_SHOW')
             ORDER BY r.guest_name
             """,
-            (d.isoformat(), d.isoformat()),
+            (day_bounds(d)[1], d.isoformat()),
         )
 
     def get_reservation_by_guest_and_date(self, guest_name: str, d: date):
@@ -499,12 +1876,12 @@ class FrontOfficeDB:
                 r.channel
             FROM reservations r
             WHERE r.guest_name = ?
-            AND date(r.arrival_date) <= date(?)
-            AND date(r.depart_date)  >= date(?)
+            AND r.arrival_date < ?
+            AND r.depart_date >= ?
             ORDER BY r.arrival_date DESC
             LIMIT 1
             """,
-            (guest_name, d.isoformat(), d.isoformat()),
+            (guest_name, day_bounds(d)[1], d.isoformat()),
         )
 
 
@@ -550,8 +1927,12 @@ class FrontOfficeDB:
         return True, "Reservation updated"
 
 
-    def __init__(self, dbpath: str):
+    def __init__(self, dbpath: str, pool_size: int = 8):
         self.dbpath = dbpath
+        self.pool = ConnectionPool(dbpath, max_size=pool_size)
+        self._tx = threading.local()
+        self._import_lock = threading.Lock()
+        self.profiler = QueryProfiler() if QUERY_PROFILING else None
         self.init_db()
         if self.reservations_empty():
             self.import_all_arrivals_from_fs()
@@ -565,29 +1946,27 @@ class FrontOfficeDB:
 # helpers
     def move_checked_in_guest(self, stay_id: int, new_room: str):
         """Move a checked-in guest to a different room (updates stays, reservations, rooms)."""
-        stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
-        if not stay:
-            return False, "Stay not found"
-
-        res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (stay["reservation_id"],))
-        if not res:
-            return False, "Reservation not found"
-
-        old_room = stay["room_number"]
-
         isvalid, normalized = self.is_valid_room_number(new_room)
         if not isvalid:
             return False, normalized
 
-        arr = datetime.fromisoformat(res["arrival_date"]).date()
-        dep = datetime.fromisoformat(res["depart_date"]).date()
+        with self.transaction() as c:
+            stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
+            if not stay:
+                return False, "Stay not found"
+
+            res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (stay["reservation_id"],))
+            if not res:
+                return False, "Reservation not found"
+
+            old_room = stay["room_number"]
 
-        available, msg = self.check_room_available_for_assignment(normalized, arr, dep, res["id"])
-        if not available:
-            return False, msg
+            arr = datetime.fromisoformat(res["arrival_date"]).date()
+            dep = datetime.fromisoformat(res["depart_date"]).date()
 
-        with closing(self.get_conn()) as conn, conn:
-            c = conn.cursor()
+            available, msg = self.check_room_available_for_assignment(normalized, arr, dep, res["id"])
+            if not available:
+                return False, msg
 
             # Update stay
             c.execute(
@@ -609,16 +1988,18 @@ class FrontOfficeDB:
         return True, f"Guest moved from {old_room} to {normalized}"
 
     def update_reservation_notes(self, reservation_id: int, main_remark: str, total_remarks: str = ""):
-        """Update Front Office notes for a reservation."""
+        """Update Front Office notes for a reservation, and its remark flags."""
+        flags = remark_flags(main_remark, total_remarks)
         self.execute(
-            """
+            f"""
             UPDATE reservations
             SET main_remark = ?,
                 total_remarks = ?,
+                {', '.join(f'{flag} = ?' for flag in REMARK_FLAGS)},
                 updated_at = datetime('now')
             WHERE id = ?
             """,
-            (main_remark, total_remarks, reservation_id),
+            (main_remark, total_remarks, *flags.values(), reservation_id),
         )
 
 
@@ -637,46 +2018,47 @@ class FrontOfficeDB:
         amount_charged = amount_charged or 0.0
         amount_pending = amount_pending or 0.0
 
-        # 1) Upsert into no_shows
-        self.execute(
-            """
-            INSERT INTO no_shows (
-                arrival_date,
-                guest_name,
-                main_client,
-                charged,
-                amount_charged,
-                amount_pending,
-                comment
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                arrival_date.isoformat(),
-                guest_name,
-                main_client,
-                charged_int,
-                amount_charged,
-                amount_pending,
-                comment,
-            ),
-        )
-
-        # 2) Mark reservation as NO_SHOW so it is excluded from arrivals
-        self.execute(
-            """
-            UPDATE reservations
-            SET reservation_status = 'NO_SHOW',
-                updated_at = datetime('now')
-            WHERE id = ?
-            """,
-            (reservation_id,),
-        )
-
-    def update_hsk_task_status(self, task_date: date, room_number: str, task_type: str, status: str, notes: str = ""):
-        self.execute(
-            """
-            INSERT INTO hsk_task_status (task_date, room_number, task_type, status, notes, updated_at)
+        with self.transaction() as c:
+            # 1) Upsert into no_shows
+            c.execute(
+                """
+                INSERT INTO no_shows (
+                    arrival_date,
+                    guest_name,
+                    main_client,
+                    charged,
+                    amount_charged,
+                    amount_pending,
+                    comment
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    arrival_date.isoformat(),
+                    guest_name,
+                    main_client,
+                    charged_int,
+                    amount_charged,
+                    amount_pending,
+                    comment,
+                ),
+            )
+
+            # 2) Mark reservation as NO_SHOW so it is excluded from arrivals
+            c.execute(
+                """
+                UPDATE reservations
+                SET reservation_status = 'NO_SHOW',
+                    updated_at = datetime('now')
+                WHERE id = ?
+                """,
+                (reservation_id,),
+            )
+
+    def update_hsk_task_status(self, task_date: date, room_number: str, task_type: str, status: str, notes: str = ""):
+        self.execute(
+            """
+            INSERT INTO hsk_task_status (task_date, room_number, task_type, status, notes, updated_at)
             VALUES (?, ?, ?, ?, ?, datetime('now'))
             ON CONFLICT(task_date, room_number, task_type)
             DO UPDATE SET status = ?, notes = ?, updated_at = datetime('now')
@@ -692,7 +2074,7 @@ class FrontOfficeDB:
             ORDER BY arrival_date DESC
             LIMIT 500
             """,
-            (room_number.strip(),),
+            (canonical_number(room_number),),
         )
 
 
@@ -703,7 +2085,7 @@ class FrontOfficeDB:
             """
             SELECT r.id, r.guest_name, r.reservation_no, r.main_client, r.room_number
             FROM reservations r
-            WHERE date(r.arrival_date) = date(?)
+            WHERE r.arrival_date >= ? AND r.arrival_date < ?
             AND NOT EXISTS (
                 SELECT 1 FROM stays s
                 WHERE s.reservation_id = r.id
@@ -711,43 +2093,134 @@ class FrontOfficeDB:
             )
             ORDER BY r.guest_name
             """,
-            (d.isoformat(),),
+            day_bounds(d),
         )
 
 
     def get_conn(self):
-            conn = sqlite3.connect(self.dbpath, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            return conn
+        """Pooled connection for the calling thread. Do not close it."""
+        return self.pool.acquire()
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
+
+    def checkpoint(self):
+        """Fold the WAL into the main file.
+
+        Runs on the raw connection: SQLite refuses a checkpoint inside the
+        BEGIN IMMEDIATE that execute() opens.
+        """
+        conn = self.get_conn()
+        if conn.in_transaction:
+            raise sqlite3.OperationalError("cannot checkpoint inside a transaction")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def enable_profiling(self, slow_ms: float = SLOW_QUERY_MS, log_path: str = SLOW_QUERY_LOG):
+        if self.profiler is None:
+            self.profiler = QueryProfiler(slow_ms=slow_ms, log_path=log_path)
+        else:
+            self.profiler.slow_ms = slow_ms
+            self.profiler.log_path = log_path
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+
+    def close(self):
+        self.pool.close()
+
+    @contextmanager
+    def transaction(self):
+        """Unit of work: every statement inside shares one connection and one commit.
+
+        Rolls back if anything raises. Nested calls (including execute()) join
+        the outermost transaction instead of committing on their own.
+        """
+        conn = self.get_conn()
+        depth = getattr(self._tx, "depth", 0)
+        if depth:
+            self._tx.depth = depth + 1
+            try:
+                yield conn.cursor()
+            finally:
+                self._tx.depth = depth
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._tx.depth = 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            self._tx.depth = 0
 
     def execute(self, query, params=None):
-        with closing(self.get_conn()) as conn, conn:
-            c = conn.cursor()
+        with self.transaction() as c:
+            profiler = self.profiler
+            if profiler is None:
+                if params is None:
+                    c.execute(query)
+                else:
+                    c.execute(query, params)
+                return c
+            start = time.perf_counter()
             if params is None:
                 c.execute(query)
             else:
                 c.execute(query, params)
+            profiler.record(c.connection, query, params, time.perf_counter() - start, max(c.rowcount, 0))
             return c
 
+    def executemany(self, query, seq_of_params) -> int:
+        """Run one statement for every parameter set in a single transaction.
+
+        Returns the number of rows changed.
+        """
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            return 0
+        with self.transaction() as c:
+            profiler = self.profiler
+            if profiler is None:
+                c.executemany(query, seq_of_params)
+                return c.rowcount
+            start = time.perf_counter()
+            c.executemany(query, seq_of_params)
+            # The first parameter set stands in for the rest in a slow-query plan
+            profiler.record(c.connection, query, seq_of_params[0], time.perf_counter() - start, max(c.rowcount, 0))
+            return c.rowcount
+
     def fetch_all(self, query, params=None):
-        with closing(self.get_conn()) as conn:
-            c = conn.cursor()
-            if params is None:
-                c.execute(query)
-            else:
-                c.execute(query, params)
-            rows = c.fetchall()
-            return [dict(row) for row in rows]
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        c = self.get_conn().cursor()
+        if params is None:
+            c.execute(query)
+        else:
+            c.execute(query, params)
+        rows = c.fetchall()
+        if profiler is not None:
+            profiler.record(c.connection, query, params, time.perf_counter() - start, len(rows))
+        return [dict(row) for row in rows]
 
     def fetch_one(self, query, params=None):
-        with closing(self.get_conn()) as conn:
-            c = conn.cursor()
-            if params is None:
-                c.execute(query)
-            else:
-                c.execute(query, params)
-            row = c.fetchone()
-            return dict(row) if row else None
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        c = self.get_conn().cursor()
+        if params is None:
+            c.execute(query)
+        else:
+            c.execute(query, params)
+        row = c.fetchone()
+        if profiler is not None:
+            profiler.record(c.connection, query, params, time.perf_counter() - start, 1 if row else 0)
+        return dict(row) if row else None
 
 
     def get_breakfast_list_for_date(self, target_date: date):
@@ -764,8 +2237,8 @@ class FrontOfficeDB:
             JOIN reservations AS r
             ON r.id = s.reservation_id
             WHERE s.status = 'CHECKED_IN'
-            AND date(s.checkin_planned) <= date(?)
-            AND date(s.checkout_planned) >= date(?)
+            AND s.checkout_planned >= ?
+            AND s.checkin_planned < ?
             AND r.room_number IS NOT NULL
             AND r.room_number != ''
             AND (
@@ -773,156 +2246,188 @@ class FrontOfficeDB:
                 OR r.meal_plan LIKE '%BB%'
                 OR lower(r.meal_plan) LIKE '%breakfast%'
             )
-            ORDER BY CAST(s.room_number AS INTEGER)
+            ORDER BY s.room_key
             """,
-            (target_date.isoformat(), target_date.isoformat()),
+            (target_date.isoformat(), day_bounds(target_date)[1]),
         )
 
 
 
     def generate_hsk_tasks_for_date(self, target_date: date):
-        """Auto-generate housekeeping tasks for the day"""
-        tasks = []
-        
-        conn = self.get_conn()
-        c = conn.cursor()
-        
-        try:
-            # Use LIKE to match the date portion of timestamp
-            target_str = target_date.isoformat()  # e.g., "2026-08-16"
-            
-            # 1. Checkouts
-            # 1. Checkouts - ALL guests departing today (checked in OR checked out)
-            c.execute("""
-                SELECT s.room_number, r.guest_name, r.main_remark, r.total_remarks, s.status
+        """Housekeeping board for the day: checkouts, stayovers and arrivals.
+
+        One query derives all three task types and LEFT JOINs the saved
+        hsk_task_status, so each task already carries "Status" and
+        "HSK Notes" and the cost does not grow with per-room lookups.
+        """
+        start, end = day_bounds(target_date)
+        rows = self.fetch_all(
+            """
+            WITH board AS (
+                -- Guests checked out today, early or on time, come first
+                SELECT 0 AS section, 0 AS rank,
+                       'CHECKOUT' AS task_type, s.room_number, s.room_key, r.guest_name,
+                       r.flag_twin, r.flag_vip, r.flag_accessible, s.status AS stay_status
                 FROM stays s
                 JOIN reservations r ON r.id = s.reservation_id
-                WHERE s.checkout_planned LIKE ?
+                WHERE s.status = 'CHECKED_OUT'
+                AND s.checkout_actual >= ? AND s.checkout_actual < ?
                 AND s.room_number IS NOT NULL AND s.room_number != ''
-                ORDER BY 
-                    CASE WHEN s.status = 'CHECKED_OUT' THEN 0 ELSE 1 END,
-                    CAST(s.room_number AS INTEGER)
-            """, (f"{target_date.isoformat()}%",))
-
-            checkouts = c.fetchall()
+                UNION ALL
+                -- then everyone else due to leave today
+                SELECT 0, 1, 'CHECKOUT', s.room_number, s.room_key, r.guest_name,
+                       r.flag_twin, r.flag_vip, r.flag_accessible, s.status
+                FROM stays s
+                JOIN reservations r ON r.id = s.reservation_id
+                WHERE s.status != 'CHECKED_OUT'
+                AND s.checkout_planned >= ? AND s.checkout_planned < ?
+                AND s.room_number IS NOT NULL AND s.room_number != ''
+                UNION ALL
+                -- In house through the night: arrived before today, leaving after today
+                SELECT DISTINCT 1, 0, 'STAYOVER', s.room_number, s.room_key, r.guest_name,
+                       0, 0, 0, s.status
+                FROM stays s
+                JOIN reservations r ON r.id = s.reservation_id
+                WHERE s.status = 'CHECKED_IN'
+                AND s.checkin_planned < ?
+                AND s.checkout_planned >= ?
+                UNION ALL
+                SELECT 2, 0, 'ARRIVAL', r.room_number, r.room_key, r.guest_name,
+                       r.flag_twin, r.flag_vip, r.flag_accessible, NULL
+                FROM reservations r
+                WHERE r.arrival_date >= ? AND r.arrival_date < ?
+                AND r.room_number IS NOT NULL AND r.room_number != ''
+            )
+            SELECT b.task_type, b.room_number, b.guest_name, b.flag_twin, b.flag_vip, b.flag_accessible, b.stay_status,
+                   COALESCE(h.status, 'PENDING') AS hsk_status, COALESCE(h.notes, '') AS hsk_notes
+            FROM board b
+            LEFT JOIN hsk_task_status h
+                ON h.task_date = ? AND h.room_number = b.room_number AND h.task_type = b.task_type
+            ORDER BY b.section, b.rank, b.room_key
+            """,
+            (start, end, start, end, start, end, start, end, target_date.isoformat()),
+        )
 
-            for co in checkouts:
-                co_dict = dict(co)
-                room = co_dict["room_number"]
-                guest = co_dict["guest_name"]
-                
+        tasks = []
+        for row in rows:
+            room = row["room_number"]
+            guest = row["guest_name"]
+            task = {"room": room, "tasktype": row["task_type"], "notes": [],
+                    "Status": row["hsk_status"], "HSK Notes": row["hsk_notes"]}
+
+            if row["task_type"] == "CHECKOUT":
+                checked_out = row["stay_status"] == "CHECKED_OUT"
                 # Mark already checked-out rooms as URGENT
-                if co_dict.get("status") == "CHECKED_OUT":
-                    priority = "URGENT"
-                else:
-                    priority = "HIGH"
-                
-                task = {
-                    "room": room,
-                    "tasktype": "CHECKOUT",
-                    "priority": priority,
-                    "description": f"Clean room {room} - {guest} checkout",
-                    "notes": []
-                }
-                
-                remarks = f"{co_dict.get('main_remark') or ''} {co_dict.get('total_remarks') or ''}".lower()
-                if '2t' in remarks:
+                task["priority"] = "URGENT" if checked_out else "HIGH"
+                task["description"] = f"Clean room {room} - {guest} checkout"
+                if row["flag_twin"]:
                     task["notes"].append("2 TWIN BEDS")
-                if 'vip' in remarks or 'birthday' in remarks:
+                if row["flag_vip"]:
                     task["priority"] = "URGENT"
                     task["notes"].append("VIP/SPECIAL")
-                
-                # Add note if already checked out
-                if co_dict.get("status") == "CHECKED_OUT":
+                if checked_out:
                     task["notes"].append("✓ CHECKED OUT - CLEAN NOW")
-                
-                tasks.append(task)
+            elif row["task_type"] == "STAYOVER":
+                task["priority"] = "MEDIUM"
+                task["description"] = f"Refresh room {room} - {guest} stayover"
+            else:
+                task["priority"] = "HIGH"
+                task["description"] = f"Prepare room {room} for {guest} arrival"
+                if row["flag_twin"]:
+                    task["notes"].append("2 TWIN BEDS")
+                if row["flag_accessible"]:
+                    task["notes"].append("ACCESSIBLE ROOM")
+            tasks.append(task)
+        return tasks
 
-            
-            # 2. Stayovers
-            c.execute("""
-                SELECT DISTINCT s.room_number, r.guest_name
+
+    def get_hsk_forecast(self, start_date: date, days: int = 7) -> pd.DataFrame:
+        """Checkout, stayover and arrival cleans for `days` days from start_date, one row per task.
+
+        A recursive CTE lists the days and one query joins them to every
+        booking: stays, plus expected reservations that have no stay yet
+        (not cancelled, no-show or vanished). A checked-out stay departs on
+        its checkout_actual day, so an early checkout is cleaned when the
+        room was left, not again on the planned date. Priorities follow the
+        daily board (checked-out or VIP checkouts are URGENT, other
+        checkouts and arrivals HIGH, stayovers MEDIUM); floor comes from
+        room_floors.
+        """
+        start, _ = day_bounds(start_date)
+        end = (start_date + timedelta(days=days)).isoformat()
+        df = pd.DataFrame(self.fetch_all(
+            """
+            WITH RECURSIVE days(d) AS (
+                SELECT ?
+                UNION ALL
+                SELECT date(d, '+1 day') FROM days WHERE date(d, '+1 day') < ?
+            ),
+            bookings AS (
+                SELECT s.room_number, s.room_key, s.status, s.checkin_planned AS arrive,
+                       s.checkout_planned AS depart, r.flag_vip
                 FROM stays s
                 JOIN reservations r ON r.id = s.reservation_id
-                WHERE s.status = 'CHECKED_IN'
-                AND s.checkin_planned LIKE ?
-                AND s.checkout_planned LIKE ?
-                ORDER BY CAST(s.room_number AS INTEGER)
-            """, (f"%{target_str.split('-')[0]}-{target_str.split('-')[1]}%", 
-                f"%{target_str.split('-')[0]}-{target_str.split('-')[1]}%"))
-            
-            stayovers = c.fetchall()
-            
-            for so in stayovers:
-                so_dict = dict(so)
-                tasks.append({
-                    "room": so_dict["room_number"],
-                    "tasktype": "STAYOVER",
-                    "priority": "MEDIUM",
-                    "description": f"Refresh room {so_dict['room_number']} - {so_dict['guest_name']} stayover",
-                    "notes": []
-                })
-            
-            # 3. Arrivals
-            c.execute("""
-                SELECT r.room_number, r.guest_name, r.main_remark, r.total_remarks
+                WHERE s.status != 'CHECKED_OUT'
+                AND s.checkout_planned >= ? AND s.checkin_planned < ?
+                UNION ALL
+                SELECT s.room_number, s.room_key, s.status, s.checkin_planned, s.checkout_actual, r.flag_vip
+                FROM stays s
+                JOIN reservations r ON r.id = s.reservation_id
+                WHERE s.status = 'CHECKED_OUT'
+                AND s.checkout_actual >= ? AND s.checkin_planned < ?
+                UNION ALL
+                SELECT r.room_number, r.room_key, 'EXPECTED', r.arrival_date, r.depart_date, r.flag_vip
                 FROM reservations r
-                WHERE r.arrival_date LIKE ?
-                AND r.room_number IS NOT NULL AND r.room_number != ''
-                ORDER BY CAST(r.room_number AS INTEGER)
-            """, (f"{target_str}%",))
-            
-            arrivals = c.fetchall()
-            
-            for arr in arrivals:
-                arr_dict = dict(arr)
-                room = arr_dict["room_number"]
-                guest = arr_dict["guest_name"]
-                
-                task = {
-                    "room": room,
-                    "tasktype": "ARRIVAL",
-                    "priority": "HIGH",
-                    "description": f"Prepare room {room} for {guest} arrival",
-                    "notes": []
-                }
-                
-                remarks = f"{arr_dict.get('main_remark') or ''} {arr_dict.get('total_remarks') or ''}".lower()
-                if '2t' in remarks:
-                    task["notes"].append("2 TWIN BEDS")
-                if 'accessible' in remarks or 'disabled' in remarks:
-                    task["notes"].append("ACCESSIBLE ROOM")
-                
-                tasks.append(task)
-        
-        finally:
-            conn.close()
-        
-        return tasks
+                WHERE r.arrival_date >= ? AND r.arrival_date < ?
+                AND r.reservation_status NOT IN ('CANCELLED', 'NO_SHOW')
+                AND r.vanished_at IS NULL
+                AND NOT EXISTS (SELECT 1 FROM stays s WHERE s.reservation_id = r.id)
+            )
+            SELECT days.d AS task_date, 'CHECKOUT' AS task_type, b.room_number, b.room_key, b.status, b.flag_vip
+            FROM days JOIN bookings b ON b.depart >= days.d AND b.depart < date(days.d, '+1 day')
+            WHERE b.status IN ('CHECKED_IN', 'CHECKED_OUT') OR (b.status = 'EXPECTED' AND b.arrive < days.d)
+            UNION ALL
+            SELECT days.d, 'STAYOVER', b.room_number, b.room_key, b.status, b.flag_vip
+            FROM days JOIN bookings b ON b.arrive < days.d AND b.depart >= date(days.d, '+1 day')
+            WHERE b.status IN ('CHECKED_IN', 'EXPECTED')
+            UNION ALL
+            SELECT days.d, 'ARRIVAL', b.room_number, b.room_key, b.status, b.flag_vip
+            FROM days JOIN bookings b ON b.arrive >= days.d AND b.arrive < date(days.d, '+1 day')
+            """,
+            (start, end, start, end, start, end, start, end),
+        ), columns=["task_date", "task_type", "room_number", "room_key", "status", "flag_vip"])
 
+        checkout = df["task_type"] == "CHECKOUT"
+        df["priority"] = "HIGH"
+        df.loc[df["task_type"] == "STAYOVER", "priority"] = "MEDIUM"
+        df.loc[checkout & ((df["status"] == "CHECKED_OUT") | (df["flag_vip"] == 1)), "priority"] = "URGENT"
+        df["floor"] = room_floors(df["room_key"])
+        return df
 
     def cancel_checkin(self, stay_id: int):
-        stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
-        if not stay:
-            return False, "Stay not found"
-        
-        self.execute("DELETE FROM stays WHERE id = ?", (stay_id,))
-        self.execute(
-            "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
-            (stay["room_number"],),
-        )
+        with self.transaction() as c:
+            stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
+            if not stay:
+                return False, "Stay not found"
+
+            c.execute("DELETE FROM stays WHERE id = ?", (stay_id,))
+            c.execute(
+                "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
+                (stay["room_number"],),
+            )
         return True, "Check-in cancelled successfully"
 
 
     def cancel_checkout(self, stay_id: int):
-        stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
-        if not stay:
-            return False, "Stay not found"
-        if stay["status"] != "CHECKED_OUT":
-            return False, "Not checked out"
-        
-        self.execute("UPDATE stays SET status = 'CHECKED_IN', checkout_actual = NULL WHERE id = ?", (stay_id,))
-        self.execute("UPDATE rooms SET status = 'OCCUPIED' WHERE room_number = ?", (stay["room_number"],))
+        with self.transaction() as c:
+            stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
+            if not stay:
+                return False, "Stay not found"
+            if stay["status"] != "CHECKED_OUT":
+                return False, "Not checked out"
+
+            c.execute("UPDATE stays SET status = 'CHECKED_IN', checkout_actual = NULL WHERE id = ?", (stay_id,))
+            c.execute("UPDATE rooms SET status = 'OCCUPIED' WHERE room_number = ?", (stay["room_number"],))
         return True, f"Check-out cancelled - room {stay['room_number']} back to in-house"
 
 
@@ -986,69 +2491,465 @@ class FrontOfficeDB:
 
 
     def build_reservations_from_df(self, df: pd.DataFrame):
-           df.columns = [str(c).strip() for c in df.columns]
-           
-           # Simple mapping - keep everything as strings initially
-           df_clean = pd.DataFrame({
-               "arrival_date": pd.to_datetime(df.get("Arrival Date"), errors='coerce'),
-               "depart_date": pd.to_datetime(df.get("Depart"), errors='coerce'),
-               "room_number": df.get("Room"),
-               "room_type_code": df.get("Room type"),
-               "adults": pd.to_numeric(df.get("AD"), errors='coerce').fillna(1).astype(int),
-               "children": 0,
-               "total_guests": pd.to_numeric(df.get("Tot. guests"), errors='coerce').fillna(1).astype(int),
-               "reservation_no": df.get("Reservation No.").astype(str),
-               "voucher": df.get("Voucher").astype(str) if "Voucher" in df.columns else None,
-               "guest_name": df.get("Guest or Group's name"),
-               "main_client": df.get("Main client"),
-               "nights": pd.to_numeric(df.get("Nights"), errors='coerce'),
-               "meal_plan": df.get("Meal Plan"),
-               "rate_code": df.get("Rate"),
-               "channel": df.get("Chanl"),
-               "main_remark": df.get("Main Rem."),
-               "contact_name": df.get("Contact person"),
-               "contact_email": df.get("E-mail"),
-               "source_of_business": df.get("Source of Business"),
-           })
-           
-           # Drop rows with invalid dates
-           df_clean = df_clean.dropna(subset=["arrival_date", "depart_date"])
-           
-           # Replace remaining NaT/NaN with None
-           df_clean = df_clean.where(pd.notna(df_clean), None)
-           
-           return df_clean
-
-
-
-    def import_arrivals_file(self, path: str):
+        return parse_arrivals_frame(df)
+
+
+
+    # Columns the front office owns once set; a re-import must not overwrite them
+    _FO_OWNED_COLUMNS = ("room_number", "main_remark", "pms_main_remark", "reservation_status")
+
+    # PMS fields whose changes between exports are written to reservation_changes
+    DIFF_COLUMNS = (
+        "arrival_date", "depart_date", "room_type_code", "meal_plan",
+        "adults", "total_guests", "nights", "guest_name",
+    )
+
+    def _diff_staged_reservations(self, c, source: str = None) -> dict:
+        """Log how temp.reservations_stage differs from reservations, in SQL.
+
+        NEW: staged numbers not yet in reservations (anti-join).
+        AMENDED: one row per DIFF_COLUMNS value that differs.
+        """
+        counts = {}
+        c.execute(
+            """
+            INSERT INTO reservation_changes (source, reservation_no, change_type)
+            SELECT ?, s.reservation_no, 'NEW'
+            FROM temp.reservations_stage s
+            WHERE s.reservation_no IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM reservations r WHERE r.reservation_no = s.reservation_no)
+            """,
+            (source,),
+        )
+        counts["new"] = c.rowcount
+
+        staged_columns = {row[1] for row in c.execute("PRAGMA temp.table_info(reservations_stage)")}
+        amended = " UNION ALL ".join(
+            f"""
+            SELECT ?, s.reservation_no, 'AMENDED', '{col}', r.{col}, s.{col}
+            FROM temp.reservations_stage s
+            JOIN reservations r ON r.reservation_no = s.reservation_no
+            WHERE r.{col} IS NOT s.{col}
+            """
+            for col in self.DIFF_COLUMNS
+            if col in staged_columns
+        )
+        c.execute(
+            f"""
+            INSERT INTO reservation_changes (source, reservation_no, change_type, column_name, old_value, new_value)
+            {amended}
+            """,
+            (source,) * amended.count("?"),
+        )
+        counts["amended"] = c.rowcount
+        return counts
+
+    def _begin_export(self, c, source: str = None):
+        """Start merging one export: forget its earlier rejects, track the bookings it lists."""
+        c.execute("DELETE FROM import_rejects WHERE source IS ?", (source,))
+        c.execute("DROP TABLE IF EXISTS temp.reservations_seen")
+        c.execute("CREATE TEMP TABLE reservations_seen (reservation_no TEXT PRIMARY KEY, arrival_date TEXT)")
+
+    def _finish_export(self, c, source: str = None, exported_at: str = None) -> int:
+        """VANISHED: bookings arriving on a date the export covers but missing
+        from it, valid or rejected; with FLAG_VANISHED_RESERVATIONS their
+        vanished_at is set.
+
+        With exported_at (the file's mtime, UTC) bookings last written by a
+        newer export are left alone: an older export re-imported late must
+        not vanish a booking a newer one moved onto its date.
+        """
+        vanished = """
+            FROM reservations r
+            WHERE r.arrival_date IN (SELECT DISTINCT arrival_date FROM temp.reservations_seen)
+            AND r.reservation_no IS NOT NULL
+            AND r.vanished_at IS NULL
+            AND r.reservation_status NOT IN ('CANCELLED', 'NO_SHOW')
+            AND (:exported_at IS NULL OR r.exported_at IS NULL OR r.exported_at <= :exported_at)
+            AND NOT EXISTS (SELECT 1 FROM temp.reservations_seen s WHERE s.reservation_no = r.reservation_no)
+        """
+        params = {"source": source, "exported_at": exported_at}
+        c.execute(
+            f"INSERT INTO reservation_changes (source, reservation_no, change_type) SELECT :source, r.reservation_no, 'VANISHED' {vanished}",
+            params,
+        )
+        count = c.rowcount
+        if FLAG_VANISHED_RESERVATIONS and count:
+            c.execute(
+                f"UPDATE reservations SET vanished_at = datetime('now') WHERE id IN (SELECT r.id {vanished})",
+                {"exported_at": exported_at},
+            )
+        c.execute("DROP TABLE temp.reservations_seen")
+        return count
+
+    def _quarantine_rejects(self, c, rejected: pd.DataFrame, source: str = None) -> int:
+        rows = rejected.astype(object).where(rejected.notna(), None).to_dict("records")
+        c.executemany(
+            """
+            INSERT INTO import_rejects (source, reservation_no, arrival_date, guest_name, room_number, reason, row_data)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (source, row["reservation_no"], row["arrival_date"], row["guest_name"], row["room_number"],
+                 row["reason"], json.dumps({k: v for k, v in row.items() if k != "reason"}, default=str))
+                for row in rows
+            ],
+        )
+        return len(rows)
+
+    def _classify_reservations(self, c, where: str, params=()) -> int:
+        """Recompute the remark flags of the reservations matching `where` from their stored remarks."""
+        rows = pd.DataFrame(
+            c.execute(f"SELECT id, main_remark, total_remarks FROM reservations WHERE {where}", params).fetchall(),
+            columns=["id", "main_remark", "total_remarks"],
+        )
+        if rows.empty:
+            return 0
+        flags = classify_remarks(rows["main_remark"].fillna("") + " " + rows["total_remarks"].fillna(""))
+        c.executemany(
+            f"UPDATE reservations SET {', '.join(f'{flag} = ?' for flag in REMARK_FLAGS)} WHERE id = ?",
+            zip(*(flags[flag].tolist() for flag in REMARK_FLAGS), rows["id"].tolist()),
+        )
+        return len(rows)
+
+    def _upsert_reservations(self, c, df_db: pd.DataFrame, source: str = None, whole_export: bool = True,
+                             exported_at: str = None) -> int:
+        """Merge parsed arrivals rows into reservations by reservation_no.
+
+        Rows are staged in a temp table and merged with one INSERT ... ON
+        CONFLICT, so re-importing the same or an overlapping file updates the
+        bookings instead of duplicating them. An assigned room_number is kept,
+        main_remark is only refreshed while the front office has not edited
+        it, and reservation_status (NO_SHOW / CANCELLED) is never touched.
+        Rows failing validate_arrivals_frame go to import_rejects instead.
+        Pass whole_export=False for one chunk of a larger export, between the
+        caller's _begin_export and _finish_export. exported_at, the export
+        file's mtime, is stored on the merged rows for _finish_export.
+        Returns the number of rows that passed validation and were merged.
+        """
+        if whole_export:
+            self._begin_export(c, source)
+        c.executemany(
+            "INSERT OR IGNORE INTO temp.reservations_seen VALUES (?, ?)",
+            df_db[["reservation_no", "arrival_date"]].dropna(subset=["reservation_no"]).itertuples(index=False, name=None),
+        )
+        df_db, rejected = validate_arrivals_frame(df_db)
+        self._quarantine_rejects(c, rejected, source)
+        if df_db.empty:
+            if whole_export:
+                self._finish_export(c, source, exported_at)
+            return 0
+
+        df_db = df_db.assign(pms_main_remark=df_db.get("main_remark"))
+        if exported_at is not None:
+            df_db = df_db.assign(exported_at=exported_at)
+        columns = list(df_db.columns)
+        column_list = ", ".join(columns)
+
+        c.execute("DROP TABLE IF EXISTS temp.reservations_stage")
+        c.execute(f"CREATE TEMP TABLE reservations_stage AS SELECT {column_list} FROM reservations WHERE 0")
+        c.executemany(
+            f"INSERT INTO temp.reservations_stage ({column_list}) VALUES ({', '.join('?' * len(columns))})",
+            df_db.itertuples(index=False, name=None),
+        )
+        self._diff_staged_reservations(c, source)
+
+        updates = [
+            f"{col} = excluded.{col}"
+            for col in columns
+            if col not in self._FO_OWNED_COLUMNS and col != "reservation_no"
+        ]
+        updates += [
+            "room_number = COALESCE(reservations.room_number, excluded.room_number)",
+            """main_remark = CASE WHEN reservations.main_remark IS reservations.pms_main_remark
+                                  THEN excluded.main_remark ELSE reservations.main_remark END""",
+            "pms_main_remark = excluded.pms_main_remark",
+            "vanished_at = NULL",  # back in the export
+            "updated_at = datetime('now')",
+        ]
+        # WHERE true keeps SQLite's parser from reading ON CONFLICT as a join constraint
+        c.execute(f"""
+            INSERT INTO reservations ({column_list})
+            SELECT {column_list} FROM temp.reservations_stage WHERE true
+            ON CONFLICT(reservation_no) DO UPDATE SET {', '.join(updates)}
+        """)
+        self._classify_reservations(c, "reservation_no IN (SELECT reservation_no FROM temp.reservations_stage)")
+        c.execute("DROP TABLE temp.reservations_stage")
+        if whole_export:
+            self._finish_export(c, source, exported_at)
+        return len(df_db)
+
+    def import_arrivals_file(self, path: str, manifest_entry: dict = None, mapping: dict = None,
+                             chunk_rows: int = IMPORT_BATCH_ROWS):
+        """Import one arrivals export (any ARRIVALS_EXTENSIONS) chunk by chunk.
+
+        Memory stays at one chunk of `chunk_rows` however long the export; all
+        chunks and, with manifest_entry, its manifest row commit together.
+        """
         try:
-            df = pd.read_excel(path)
-            df_db = self.build_reservations_from_df(df)
-            from contextlib import closing
-            with closing(self.get_conn()) as conn:
-                df_db.to_sql("reservations", conn, if_exists="append", index=False)
-            return len(df_db)
+            return self._stream_arrivals_file(path, manifest_entry, mapping, chunk_rows)
         except Exception as e:
             st.error(f"Import error: {e}")
             return 0
 
+    def _stream_arrivals_file(self, path: str, manifest_entry: dict = None, mapping: dict = None,
+                              chunk_rows: int = IMPORT_BATCH_ROWS) -> int:
+        source = self._manifest_key(path)
+        try:
+            exported_at = self._export_timestamp(os.stat(path).st_mtime_ns)
+            rows = 0
+            with self.transaction() as c:
+                self._begin_export(c, source)
+                for frame in open_arrivals_source(path, mapping).batches(chunk_rows):
+                    if frame.empty:
+                        continue
+                    rows += self._upsert_reservations(
+                        c, frame, source=source, whole_export=False, exported_at=exported_at
+                    )
+                self._finish_export(c, source, exported_at)
+                if manifest_entry is not None:
+                    self._record_manifest(c, manifest_entry, "OK", rows=rows)
+            return rows
+        except Exception as e:
+            if manifest_entry is not None:
+                with self.transaction() as c:
+                    self._record_manifest(c, manifest_entry, "ERROR", error=f"{type(e).__name__}: {e}")
+            raise
+
+    # ---- arrivals file manifest ----
+
+    @staticmethod
+    def _manifest_key(path: str) -> str:
+        return os.path.relpath(path, ARRIVALS_ROOT).replace(os.sep, "/")
+
+    @staticmethod
+    def _export_timestamp(mtime_ns: int) -> str:
+        """A file mtime in the UTC 'YYYY-MM-DD HH:MM:SS' form of datetime('now')."""
+        return datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _file_sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _record_manifest(self, c, entry: dict, status: str, rows: int = None, error: str = None):
+        c.execute(
+            """
+            INSERT INTO import_manifest (path, size, mtime_ns, sha256, rows, status, error, imported_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,
+                rows = excluded.rows, status = excluded.status, error = excluded.error,
+                imported_at = excluded.imported_at
+            """,
+            (entry["path"], entry["size"], entry["mtime_ns"], entry["sha256"], rows, status, error),
+        )
+
+    def list_arrivals_files(self) -> list:
+        """Arrivals exports under ARRIVALS_ROOT, without Excel's ~$ lock files."""
+        pattern = os.path.join(ARRIVALS_ROOT, "**", "Arrivals *.*")
+        return sorted(
+            path for path in glob(pattern, recursive=True)
+            if not os.path.basename(path).startswith("~$")
+            and os.path.splitext(path)[1].lower() in ARRIVALS_EXTENSIONS
+        )
 
+    def pending_arrivals_files(self) -> list:
+        """Manifest entries for files that are new or changed since they were last imported.
+
+        Size and mtime are compared first; the file is only hashed when they
+        differ, so an unchanged folder costs one stat() per file.
+        """
+        known = {
+            row["path"]: row
+            for row in self.fetch_all("SELECT path, size, mtime_ns, sha256 FROM import_manifest")
+        }
+        pending = []
+        for path in self.list_arrivals_files():
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entry = {"path": self._manifest_key(path), "file": path, "size": info.st_size, "mtime_ns": info.st_mtime_ns}
+            seen = known.get(entry["path"])
+            if seen and seen["size"] == entry["size"] and seen["mtime_ns"] == entry["mtime_ns"]:
+                continue
+            entry["sha256"] = self._file_sha256(path)
+            if seen and seen["sha256"] == entry["sha256"]:
+                # Touched but not changed: remember the new mtime, nothing to import
+                self.execute(
+                    "UPDATE import_manifest SET size = ?, mtime_ns = ? WHERE path = ?",
+                    (entry["size"], entry["mtime_ns"], entry["path"]),
+                )
+                continue
+            pending.append(entry)
+        return pending
+
+    @staticmethod
+    def _parse_arrivals_files(paths: list, workers: int, hashes: list = None, mapping: dict = None):
+        """Yield parse_arrivals_workbook results in `paths` order.
+
+        Never forks: this runs on Streamlit's script threads and the watcher
+        thread, and a forked child can inherit a lock (the connection pool,
+        logging, pandas) that another thread was holding. When app is
+        imported as a module, as by benchmark.py, workbooks are parsed by
+        spawned processes. Under `streamlit run` the script is __main__,
+        which a spawned child cannot import, so a thread pool overlaps the
+        parsing with the writer instead. If a worker process dies, the
+        remaining files are parsed here.
+        """
+        hashes = hashes or [None] * len(paths)
+        mappings = [mapping or load_arrivals_mapping()] * len(paths)
+        cache_dirs = [PARSE_CACHE_DIR] * len(paths)
+        done = 0
+        if workers > 1 and len(paths) > 1:
+            workers = min(workers, len(paths))
+            if parse_arrivals_workbook.__module__ != "__main__":
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers)
+            try:
+                with pool:
+                    for result in pool.map(parse_arrivals_workbook, paths, hashes, mappings, cache_dirs, chunksize=4):
+                        yield result
+                        done += 1
+            except BrokenProcessPool:
+                pass
+        for path, sha256 in zip(paths[done:], hashes[done:]):
+            yield parse_arrivals_workbook(path, sha256, mappings[0], cache_dirs[0])
+
+    def _write_arrivals_batch(self, batch: list, summary: dict):
+        """Merge the parsed frames of several files and their manifest entries in one transaction.
+
+        Files are merged one after the other, oldest path first, so each
+        export is diffed against the state the previous one left. If the
+        batch fails its files are retried one at a time, so only the file
+        that fails is marked ERROR.
+        """
+        try:
+            rows = 0
+            with self.transaction() as c:
+                for entry, frame in batch:
+                    accepted = 0
+                    if not frame.empty:
+                        accepted = self._upsert_reservations(
+                            c, frame, source=entry["path"], exported_at=self._export_timestamp(entry["mtime_ns"])
+                        )
+                    self._record_manifest(c, entry, "OK", rows=accepted)
+                    rows += accepted
+        except Exception as e:
+            if len(batch) > 1:
+                for item in batch:
+                    self._write_arrivals_batch([item], summary)
+                return
+            entry, _ = batch[0]
+            error = f"{type(e).__name__}: {e}"
+            with self.transaction() as c:
+                self._record_manifest(c, entry, "ERROR", error=error)
+            summary["errors"].append((entry["path"], error))
+            return
+        summary["files"] += len(batch)
+        summary["rows"] += rows
+
+    def import_new_arrivals(self, workers: int = None, batch_rows: int = None) -> dict:
+        """Import only new or changed arrivals files. Safe to run at any time.
+
+        Files are parsed by `workers` workers (default IMPORT_WORKERS) and
+        written by this thread in transactions of about `batch_rows` rows. A
+        file that fails is recorded and reported; the rest still import.
+        """
+        with self._import_lock:
+            return self._import_new_arrivals(workers, batch_rows)
+
+    def _import_new_arrivals(self, workers: int, batch_rows: int) -> dict:
+        workers = IMPORT_WORKERS if workers is None else workers
+        batch_rows = IMPORT_BATCH_ROWS if batch_rows is None else batch_rows
+        summary = {"files": 0, "rows": 0, "errors": [], "seconds": 0.0, "files_per_s": None}
+        pending = self.pending_arrivals_files()
+        if not pending:
+            return summary
+
+        start = time.perf_counter()
+        mapping = load_arrivals_mapping()
+        # Long CSV exports stream in their own transaction rather than through the pool
+        streamed = {entry["path"] for entry in pending if open_arrivals_source(entry["file"], mapping).streamed}
+        pooled = [entry for entry in pending if entry["path"] not in streamed]
+        parsed = self._parse_arrivals_files(
+            [entry["file"] for entry in pooled], workers, [entry["sha256"] for entry in pooled], mapping
+        )
+
+        # Oldest path first whatever the format, so each export is diffed
+        # against the state the one before it left
+        batch, rows_in_batch = [], 0
+        for entry in pending:
+            if entry["path"] in streamed:
+                if batch:
+                    self._write_arrivals_batch(batch, summary)
+                    batch, rows_in_batch = [], 0
+                try:
+                    summary["rows"] += self._stream_arrivals_file(entry["file"], entry, mapping)
+                    summary["files"] += 1
+                except Exception as e:
+                    summary["errors"].append((entry["path"], f"{type(e).__name__}: {e}"))
+                continue
+            _, frame, error = next(parsed)
+            if error is not None:
+                with self.transaction() as c:
+                    self._record_manifest(c, entry, "ERROR", error=error)
+                summary["errors"].append((entry["path"], error))
+                continue
+            batch.append((entry, frame))
+            rows_in_batch += len(frame)
+            if rows_in_batch >= batch_rows:
+                self._write_arrivals_batch(batch, summary)
+                batch, rows_in_batch = [], 0
+        if batch:
+            self._write_arrivals_batch(batch, summary)
+
+        summary["seconds"] = round(time.perf_counter() - start, 2)
+        if summary["seconds"]:
+            summary["files_per_s"] = round(len(pending) / summary["seconds"], 1)
+        evict_parse_cache()
+        return summary
+
+    def get_reservation_changes(self, limit: int = 200, change_type: str = None):
+        sql = """
+            SELECT ch.detected_at, ch.change_type, ch.reservation_no, r.guest_name,
+                   r.arrival_date, ch.column_name, ch.old_value, ch.new_value, ch.source
+            FROM reservation_changes ch
+            LEFT JOIN reservations r ON r.reservation_no = ch.reservation_no
+        """
+        params = []
+        if change_type:
+            sql += " WHERE ch.change_type = ?"
+            params.append(change_type)
+        sql += " ORDER BY ch.id DESC LIMIT ?"
+        params.append(limit)
+        return self.fetch_all(sql, tuple(params))
+
+    def import_manifest_summary(self) -> dict:
+        return self.fetch_one(
+            """
+            SELECT COUNT(*) AS files,
+                   COALESCE(SUM(rows), 0) AS rows,
+                   SUM(status = 'ERROR') AS errors,
+                   MAX(imported_at) AS last_import
+            FROM import_manifest
+            """
+        )
 
     def import_all_arrivals_from_fs(self) -> int:
-        pattern = os.path.join(ARRIVALS_ROOT, "**", "Arrivals *.XLSX")
-        files = sorted(glob(pattern, recursive=True))
-        total = 0
-        for path in files:
-            total += self.import_arrivals_file(path)
-        return total
+        return self.import_new_arrivals()["rows"]
 
     def get_arrivals_for_date(self, d: date):
         return self.fetch_all(
             """
             SELECT r.*
             FROM reservations AS r
-            WHERE date(r.arrival_date) = date(?)
+            WHERE r.arrival_date >= ? AND r.arrival_date < ?
             AND r.reservation_status NOT IN ('CHECKED_IN', 'CHECKED_OUT')
             AND NOT EXISTS (
                 SELECT 1
@@ -1056,9 +2957,9 @@ class FrontOfficeDB:
                 WHERE s.reservation_id = r.id
                     AND s.status IN ('CHECKED_IN', 'CHECKED_OUT')
             )
-            ORDER BY COALESCE(r.room_number, ''), r.guest_name
+            ORDER BY COALESCE(r.room_key, 0), r.guest_name
             """,
-            (d.isoformat(),),
+            day_bounds(d),
         )
 
 
@@ -1072,26 +2973,27 @@ class FrontOfficeDB:
         if not isvalid:
             return False, result
 
+        # result is the canonical room number from here on
+        room_number = result
+
         # NEW: block dirty rooms
         if not self.is_room_clean(room_number):
             return False, "Room is marked DIRTY. Please choose a clean room."
 
-        with closing(self.get_conn()) as conn:
-            c = conn.cursor()
-            c.execute("SELECT arrival_date, depart_date FROM reservations WHERE id = ?", (resid,))
-            res = c.fetchone()
+        # Availability check and assignment under one write lock, so two
+        # terminals cannot give the same room away at the same time
+        with self.transaction() as c:
+            res = self.fetch_one("SELECT arrival_date, depart_date FROM reservations WHERE id = ?", (resid,))
             if not res:
                 return False, "Reservation not found"
 
             arr = datetime.fromisoformat(res["arrival_date"]).date()
             dep = datetime.fromisoformat(res["depart_date"]).date()
 
-        available, msg = self.check_room_available_for_assignment(room_number, arr, dep, resid)
-        if not available:
-            return False, msg
+            available, msg = self.check_room_available_for_assignment(room_number, arr, dep, resid)
+            if not available:
+                return False, msg
 
-        with closing(self.get_conn()) as conn, conn:
-            c = conn.cursor()
             c.execute(
                 "UPDATE reservations SET room_number = ?, updated_at = datetime('now') WHERE id = ?",
                 (room_number, resid),
@@ -1109,10 +3011,10 @@ class FrontOfficeDB:
             FROM stays s
             JOIN reservations r ON r.id = s.reservation_id
             WHERE s.status = 'CHECKED_OUT'
-            AND date(s.checkout_actual) = date(?)
-            ORDER BY CAST(s.room_number AS INTEGER)
+            AND s.checkout_actual >= ? AND s.checkout_actual < ?
+            ORDER BY s.room_key
             """,
-            (d.isoformat(),),
+            day_bounds(d),
         )
 
 
@@ -1127,7 +3029,7 @@ class FrontOfficeDB:
 
         self.execute(
             "UPDATE rooms SET status = ? WHERE room_number = ?",
-            (status, room_number.strip()),
+            (status, canonical_number(room_number)),
         )
         return True, f"Room {room_number} set to {status}"
 
@@ -1139,7 +3041,7 @@ class FrontOfficeDB:
         self.execute("""
             INSERT INTO rooms (room_number, status) VALUES (:room, 'VACANT')
             ON CONFLICT (room_number) DO NOTHING
-        """, {"room": room_number.strip()})
+        """, {"room": canonical_number(room_number)})
 
     def check_room_conflict(self, room_number: str, d: date):
     # This method is no longer needed - already handled by check_room_available_for_assignment
@@ -1147,76 +3049,35 @@ class FrontOfficeDB:
 
 
     def checkin_reservation(self, res_id: int):
-        res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (res_id,))
+        with self.transaction() as c:
+            res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (res_id,))
 
-        if not res:
-            return False, "Reservation not found"
-        if not res["room_number"]:
-            return False, "Assign a room first"
-        
-        is_valid, result = self.is_valid_room_number(res["room_number"])
-        if not is_valid:
-            return False, result
-        
-        # if res["arrival_date"] < date.today():
-        #     return False, f"Cannot check in for past date"
-        
-        self.ensure_room_exists(result)
-        
-        self.execute("""
-            INSERT INTO stays (reservation_id, room_number, status, checkin_planned, checkout_planned, checkin_actual)
-            VALUES (:res_id, :room, 'CHECKED_IN', :arr, :dep, CURRENT_TIMESTAMP)
-        """, {"res_id": res_id, "room": result, "arr": res["arrival_date"], "dep": res["depart_date"]})
-        
-        self.execute(
-    "UPDATE rooms SET status = 'OCCUPIED' WHERE room_number = ?",
-    (result,),
-)
-
-        return True, "Checked in successfully"
-    
-    def checkout_stay(self, stay_id: int):
-        # Try to find existing stay by stay_id
-        stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
-        
-        if stay:
-            # Existing stay: mark as checked out
-            self.execute(
-                "UPDATE stays SET status = 'CHECKED_OUT', checkout_actual = datetime('now') WHERE id = ?",
-                (stay_id,),
-            )
-            self.execute(
-                "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
-                (stay["room_number"],),
-            )
-        else:
-            # No stay row: treat stay_id as reservation_id
-            res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (stay_id,))
-            if not res or not res["room_number"]:
-                return False, "Reservation not found or no room assigned"
-            
-            self.execute(
-                """
-                INSERT INTO stays (
-                    reservation_id, room_number, status,
-                    checkin_planned, checkout_planned,
-                    checkin_actual, checkout_actual
-                )
-                VALUES (?, ?, 'CHECKED_OUT', ?, ?, datetime('now'), datetime('now'))
-                """,
-                (stay_id, res["room_number"], res["arrival_date"], res["depart_date"]),
-            )
-            self.execute(
-                "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
-                (res["room_number"],),
-            )
+            if not res:
+                return False, "Reservation not found"
+            if not res["room_number"]:
+                return False, "Assign a room first"
 
-        return True, "Checked out successfully"
+            is_valid, result = self.is_valid_room_number(res["room_number"])
+            if not is_valid:
+                return False, result
 
+            # if res["arrival_date"] < date.today():
+            #     return False, f"Cannot check in for past date"
 
+            self.ensure_room_exists(result)
 
+            c.execute("""
+                INSERT INTO stays (reservation_id, room_number, status, checkin_planned, checkout_planned, checkin_actual)
+                VALUES (:res_id, :room, 'CHECKED_IN', :arr, :dep, CURRENT_TIMESTAMP)
+            """, {"res_id": res_id, "room": result, "arr": res["arrival_date"], "dep": res["depart_date"]})
 
+            c.execute(
+                "UPDATE rooms SET status = 'OCCUPIED' WHERE room_number = ?",
+                (result,),
+            )
 
+        return True, "Checked in successfully"
+    
     def get_inhouse(self, target_date: date = None):
         """Get only CHECKED_IN guests who are actually in the hotel."""
         if not target_date:
@@ -1236,17 +3097,18 @@ class FrontOfficeDB:
                 r.main_remark    AS main_remark,
                 r.total_remarks  AS total_remarks,
                 s.comment        AS comment,
+                s.flag_parking   AS flag_parking,
                 COALESCE(s.parking_space, '') AS parking_space,
                 COALESCE(s.parking_plate, '') AS parking_plate,
                 s.status
             FROM stays s
             JOIN reservations r ON r.id = s.reservation_id
             WHERE s.status = 'CHECKED_IN'
-            AND date(s.checkin_planned) <= date(?)
-            AND date(s.checkout_planned) >= date(?)
-            ORDER BY s.room_number
+            AND s.checkout_planned >= ?
+            AND s.checkin_planned < ?
+            ORDER BY s.room_key
             """,
-            (target_date.isoformat(), target_date.isoformat()),
+            (target_date.isoformat(), day_bounds(target_date)[1]),
         )
 
 
@@ -1263,10 +3125,10 @@ class FrontOfficeDB:
             FROM stays s
             JOIN reservations r ON r.id = s.reservation_id
             WHERE s.status = 'CHECKED_IN'
-            AND date(s.checkout_planned) = date(?)
-            ORDER BY CAST(s.room_number AS INTEGER)
+            AND s.checkout_planned >= ? AND s.checkout_planned < ?
+            ORDER BY s.room_key
             """,
-            (d.isoformat(),),
+            day_bounds(d),
         )
 
 
@@ -1274,72 +3136,159 @@ class FrontOfficeDB:
 
     def checkout_stay(self, stay_id: int):
         """Checkout a guest - handles both stay IDs and reservation IDs"""
-    
-        # Try to find existing stay
-        stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
-        
-        if stay:
-            # Actual stay exists - update it
-            self.execute(
-            "UPDATE stays SET status = 'CHECKED_OUT', checkout_actual = datetime('now') WHERE id = ?",
-            (stay_id,),
-        )
-            self.execute(
-            "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
-            (stay["room_number"],),
-)
-        else:
-            # No stay exists - create one as checked out
-            res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (stay_id,))
+        with self.transaction() as c:
+            # Try to find existing stay
+            stay = self.fetch_one("SELECT * FROM stays WHERE id = ?", (stay_id,))
+
+            if stay:
+                # Actual stay exists - update it
+                c.execute(
+                    "UPDATE stays SET status = 'CHECKED_OUT', checkout_actual = datetime('now') WHERE id = ?",
+                    (stay_id,),
+                )
+                c.execute(
+                    "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
+                    (stay["room_number"],),
+                )
+            else:
+                # No stay exists - create one as checked out
+                res = self.fetch_one("SELECT * FROM reservations WHERE id = ?", (stay_id,))
+
+                if not res or not res["room_number"]:
+                    return False, "Reservation not found or no room assigned"
 
-            
-            if not res or not res["room_number"]:
-                return False, "Reservation not found or no room assigned"
-            
-            self.execute("""
-                INSERT INTO stays (reservation_id, room_number, status, 
-                                checkin_planned, checkout_planned, 
-                                checkin_actual, checkout_actual)
-                VALUES (:res_id, :room, 'CHECKED_OUT', :arr, :dep, 
-                        CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            """, {
-                "res_id": stay_id, 
-                "room": res["room_number"], 
-                "arr": res["arrival_date"], 
-                "dep": res["depart_date"]
-            })
-            
-            self.execute(
-    "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
-    (res["room_number"],),
-)
+                c.execute("""
+                    INSERT INTO stays (reservation_id, room_number, status, 
+                                    checkin_planned, checkout_planned, 
+                                    checkin_actual, checkout_actual)
+                    VALUES (:res_id, :room, 'CHECKED_OUT', :arr, :dep, 
+                            CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                """, {
+                    "res_id": stay_id, 
+                    "room": res["room_number"], 
+                    "arr": res["arrival_date"], 
+                    "dep": res["depart_date"]
+                })
 
-        
-        return True, "Checked out successfully"
+                c.execute(
+                    "UPDATE rooms SET status = 'VACANT' WHERE room_number = ?",
+                    (res["room_number"],),
+                )
 
+        return True, "Checked out successfully"
 
 
-    from contextlib import closing
 
     def seed_rooms_from_blocks(self):
-        with closing(self.get_conn()) as conn, conn:
-            c = conn.cursor()
-            for start, end in ROOM_BLOCKS:
-                for rn in range(start, end + 1):
-                    c.execute(
-                        "INSERT OR IGNORE INTO rooms (room_number, status) VALUES (?, 'VACANT')",
-                        (str(rn),),
-                    )
+        with self.transaction() as c:
+            c.executemany(
+                "INSERT OR IGNORE INTO rooms (room_number, status) VALUES (?, 'VACANT')",
+                [(str(rn),) for start, end in ROOM_BLOCKS for rn in range(start, end + 1)],
+            )
 
 
+    STAYS_CSV_COLUMNS = (
+        "id", "reservation_id", "room_number", "status",
+        "checkin_planned", "checkout_planned", "checkin_actual", "checkout_actual",
+        "parking_space", "parking_plate", "parking_notes",
+    )
+    STAYS_CSV_REQUIRED = ("reservation_id", "room_number", "checkin_planned", "checkout_planned")
+
+    def _validate_stays_chunk(self, chunk: pd.DataFrame, first_line: int):
+        """Split one CSV chunk into (rows to insert, rejected rows with a reason), column-wise."""
+        chunk = chunk.reindex(columns=self.STAYS_CSV_COLUMNS)
+        text = chunk.apply(lambda col: col.astype("string").str.strip().replace("", pd.NA))
+        reason = pd.Series(pd.NA, index=chunk.index, dtype="string")
+
+        def reject(mask, why):
+            mask = mask.fillna(False).astype(bool) & reason.isna()
+            reason[mask] = why
+
+        stay_id = pd.to_numeric(text["id"], errors="coerce")
+        reject(text["id"].notna() & (stay_id.isna() | (stay_id % 1 != 0)), "id is not a whole number")
+        reservation_id = pd.to_numeric(text["reservation_id"], errors="coerce")
+        reject(reservation_id.isna() | (reservation_id % 1 != 0), "reservation_id missing or not a whole number")
+        room = canonical_number_series(text["room_number"].astype(object).where(text["room_number"].notna(), None))
+        reject(room.isna(), "room_number missing")
+        status = text["status"].str.upper().fillna("CHECKED_IN")
+        reject(~status.isin(["CHECKED_IN", "CHECKED_OUT"]), "status must be CHECKED_IN or CHECKED_OUT")
+
+        dates = {
+            col: pd.to_datetime(text[col], errors="coerce", format="ISO8601")
+            for col in ("checkin_planned", "checkout_planned", "checkin_actual", "checkout_actual")
+        }
+        for col in ("checkin_planned", "checkout_planned"):
+            reject(dates[col].isna(), f"{col} missing or not an ISO date")
+        for col in ("checkin_actual", "checkout_actual"):
+            reject(text[col].notna() & dates[col].isna(), f"{col} is not an ISO date/time")
+        reject(dates["checkout_planned"] < dates["checkin_planned"], "checkout_planned before checkin_planned")
+
+        ok = reason.isna()
+        rows = pd.DataFrame({
+            "id": stay_id[ok].astype("Int64"),
+            "reservation_id": reservation_id[ok].astype("Int64"),
+            "room_number": room[ok],
+            "status": status[ok],
+            "checkin_planned": dates["checkin_planned"][ok].dt.strftime("%Y-%m-%d"),
+            "checkout_planned": dates["checkout_planned"][ok].dt.strftime("%Y-%m-%d"),
+            "checkin_actual": dates["checkin_actual"][ok].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "checkout_actual": dates["checkout_actual"][ok].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "parking_space": text["parking_space"][ok].fillna(""),
+            "parking_plate": text["parking_plate"][ok].fillna(""),
+            "parking_notes": text["parking_notes"][ok].fillna(""),
+        }).astype(object)
+        rows = rows.where(rows.notna(), None)
+
+        rejected = chunk[~ok].astype(object)
+        rejected = rejected.where(rejected.notna(), None)
+        rejected.insert(0, "reason", reason[~ok].astype(object))
+        rejected.insert(0, "line", chunk.index[~ok] + first_line)
+        return rows, rejected
+
+    def import_stays_csv(self, source, chunksize: int = 5000, progress=None) -> dict:
+        """Load a stays CSV in one transaction, then resync room statuses.
+
+        The file is read `chunksize` rows at a time; each chunk is validated
+        column-wise and written with one executemany. Invalid rows are skipped
+        and returned with their CSV line number and reason. Nothing is written
+        if the file lacks a required column or any statement fails.
+        `progress(rows_read, imported, rejected)` is called after every chunk.
+        """
+        reader = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False)
+        result = {"read": 0, "imported": 0, "rejected": []}
+        with self.transaction() as c:
+            for number, chunk in enumerate(reader):
+                if number == 0:
+                    chunk.columns = [str(col).strip() for col in chunk.columns]
+                    columns = list(chunk.columns)
+                    missing = [col for col in self.STAYS_CSV_REQUIRED if col not in columns]
+                    if missing:
+                        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+                else:
+                    chunk.columns = columns
+                rows, rejected = self._validate_stays_chunk(chunk, first_line=2)
+                c.executemany(
+                    f"""
+                    INSERT OR REPLACE INTO stays ({', '.join(self.STAYS_CSV_COLUMNS)})
+                    VALUES ({', '.join('?' * len(self.STAYS_CSV_COLUMNS))})
+                    """,
+                    rows.itertuples(index=False, name=None),
+                )
+                result["read"] += len(chunk)
+                result["imported"] += len(rows)
+                result["rejected"].extend(rejected.to_dict("records"))
+                if progress is not None:
+                    progress(result["read"], result["imported"], len(result["rejected"]))
+            self.sync_room_status_from_stays()
+        return result
+
     def sync_room_status_from_stays(self):
-        self.execute("UPDATE rooms SET status = 'VACANT'")
-        occupied = self.fetch_all("SELECT DISTINCT room_number FROM stays WHERE status = 'CHECKED_IN'")
-        for row in occupied:
-            self.execute(
-    "UPDATE rooms SET status = 'OCCUPIED' WHERE room_number = ?",
-    (row["room_number"],),
-)
+        with self.transaction() as c:
+            c.execute("UPDATE rooms SET status = 'VACANT'")
+            c.execute("""
+                UPDATE rooms SET status = 'OCCUPIED'
+                WHERE room_number IN (SELECT room_number FROM stays WHERE status = 'CHECKED_IN')
+            """)
 
     
     def update_parking_for_stay(self, stay_id: int, space: str, plate: str, notes: str):
@@ -1382,7 +3331,7 @@ class FrontOfficeDB:
             )
             ORDER BY
                 s.parking_space,
-                CAST(s.room_number AS INTEGER)
+                s.room_key
             """,
             (target_date.isoformat(),),
         )
@@ -1410,64 +3359,65 @@ class FrontOfficeDB:
         amount_pending: float,
         comment: str,
     ):
-        existing = self.fetch_one(
-            """
-            SELECT id
-            FROM no_shows
-            WHERE guest_name = ?
-            AND date(arrival_date) = date(?)
-            """,
-            (guest_name, arrival_date.isoformat()),
-        )
-
-        charged_int = 1 if charged else 0
-        amount_charged = amount_charged or 0.0
-        amount_pending = amount_pending or 0.0
-
-        if existing:
-            self.execute(
+        with self.transaction():
+            existing = self.fetch_one(
                 """
-                UPDATE no_shows
-                SET main_client   = ?,
-                    charged       = ?,
-                    amount_charged = ?,
-                    amount_pending = ?,
-                    comment       = ?
-                WHERE id = ?
+                SELECT id
+                FROM no_shows
+                WHERE guest_name = ?
+                AND arrival_date >= ? AND arrival_date < ?
                 """,
-                (
-                    main_client,
-                    charged_int,
-                    amount_charged,
-                    amount_pending,
-                    comment,
-                    existing["id"],
-                ),
+                (guest_name, *day_bounds(arrival_date)),
             )
-        else:
-            self.execute(
-                """
-                INSERT INTO no_shows (
-                    arrival_date,
-                    guest_name,
-                    main_client,
-                    charged,
-                    amount_charged,
-                    amount_pending,
-                    comment
+
+            charged_int = 1 if charged else 0
+            amount_charged = amount_charged or 0.0
+            amount_pending = amount_pending or 0.0
+
+            if existing:
+                self.execute(
+                    """
+                    UPDATE no_shows
+                    SET main_client   = ?,
+                        charged       = ?,
+                        amount_charged = ?,
+                        amount_pending = ?,
+                        comment       = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        main_client,
+                        charged_int,
+                        amount_charged,
+                        amount_pending,
+                        comment,
+                        existing["id"],
+                    ),
+                )
+            else:
+                self.execute(
+                    """
+                    INSERT INTO no_shows (
+                        arrival_date,
+                        guest_name,
+                        main_client,
+                        charged,
+                        amount_charged,
+                        amount_pending,
+                        comment
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        arrival_date.isoformat(),
+                        guest_name,
+                        main_client,
+                        charged_int,
+                        amount_charged,
+                        amount_pending,
+                        comment,
+                    ),
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    arrival_date.isoformat(),
-                    guest_name,
-                    main_client,
-                    charged_int,
-                    amount_charged,
-                    amount_pending,
-                    comment,
-                ),
-            )
 
 
     def get_no_shows_for_date(self, target_date: date):
@@ -1475,48 +3425,76 @@ class FrontOfficeDB:
             """
             SELECT *
             FROM no_shows
-            WHERE date(arrival_date) = date(?)
+            WHERE arrival_date >= ? AND arrival_date < ?
             ORDER BY created_at
             """,
-            (target_date.isoformat(),),
+            day_bounds(target_date),
         )
 
     
     def get_twin_rooms(self):
-        rows = self.fetch_all("SELECT room_number FROM rooms WHERE is_twin = 1 ORDER BY CAST(room_number AS INTEGER)")
+        rows = self.fetch_all("SELECT room_number FROM rooms WHERE is_twin = 1 ORDER BY room_key")
         return [r["room_number"] for r in rows]
     
     def get_all_rooms(self):
-        rows = self.fetch_all("SELECT room_number FROM rooms ORDER BY CAST(room_number AS INTEGER)")
+        rows = self.fetch_all("SELECT room_number FROM rooms ORDER BY room_key")
         return [r["room_number"] for r in rows]
     
     def set_spare_rooms_for_date(self, target_date: date, rooms: list):
-        self.execute("DELETE FROM spare_rooms WHERE target_date = :date", {"date": target_date})
-        for rn in rooms:
-            self.execute("INSERT INTO spare_rooms (target_date, room_number) VALUES (:date, :room)", 
-                         {"date": target_date, "room": rn})
+        with self.transaction() as c:
+            c.execute("DELETE FROM spare_rooms WHERE target_date = :date", {"date": target_date})
+            c.executemany("INSERT INTO spare_rooms (target_date, room_number) VALUES (:date, :room)", 
+                          [{"date": target_date, "room": rn} for rn in rooms])
     
     def get_spare_rooms_for_date(self, target_date: date):
         rows = self.fetch_all("""
             SELECT room_number FROM spare_rooms WHERE target_date = :date
-            ORDER BY CAST(room_number AS INTEGER)
+            ORDER BY room_key
         """, {"date": target_date})
         return [r["room_number"] for r in rows]
     
-    def search_reservations(self, q: str):
+    def _check_fts(self):
+        """Remember whether migration 10 could create reservations_fts (no FTS5 in some SQLite builds)."""
+        self.fts_available = self.fetch_one(
+            "SELECT 1 AS x FROM sqlite_master WHERE name = 'reservations_fts'"
+        ) is not None
+
+    def search_reservations(self, q: str, columns: tuple = None):
+        """Reservations matching a search box entry, newest arrival first.
+
+        Uses the reservations_fts index (word prefixes, field:term, see
+        fts_match_query); without FTS5 falls back to LIKE over `columns`, or
+        the name, room, number, client and channel. An error from the index
+        is shown before falling back, since it means the index needs a
+        rebuild.
+        """
+        match = fts_match_query(q, columns) if self.fts_available else None
+        if match:
+            try:
+                return self.fetch_all(
+                    """
+                    SELECT r.*
+                    FROM reservations_fts
+                    JOIN reservations r ON r.id = reservations_fts.rowid
+                    WHERE reservations_fts MATCH ?
+                    ORDER BY r.arrival_date DESC
+                    LIMIT 500
+                    """,
+                    (match,),
+                )
+            except sqlite3.OperationalError as e:
+                st.warning(f"Full-text search failed ({e}); searching without the index.")
+
+        columns = columns or ("guest_name", "room_number", "reservation_no", "main_client", "channel")
         like_pattern = f"%{q}%"
         return self.fetch_all(
-            """
+            f"""
             SELECT * FROM reservations
-            WHERE guest_name LIKE ?
-            OR room_number LIKE ?
-            OR reservation_no LIKE ?
-            OR main_client LIKE ?
-            OR channel LIKE ?
+            WHERE {" OR ".join(f"{col} LIKE ?" for col in columns)}
             ORDER BY arrival_date DESC
             LIMIT 500
             """,
-            (like_pattern, like_pattern, like_pattern, like_pattern, like_pattern),
+            (like_pattern,) * len(columns),
         )
     
     def cancel_reservation(self, reservation_id: int):
@@ -1533,9 +3511,7 @@ class FrontOfficeDB:
 
     
     def read_table(self, name: str):
-        from contextlib import closing
-        with closing(self.get_conn()) as conn:
-            return pd.read_sql_query(f"SELECT * FROM {name}", conn)
+        return pd.read_sql_query(f"SELECT * FROM {name}", self.get_conn())
 
 
 
@@ -1577,6 +3553,181 @@ class FrontOfficeDB:
         return output
 
 
+def _db_file_signature(dbpath: str):
+    """Identity of the DB file on disk; changes when the file is swapped out."""
+    if not os.path.exists(dbpath):
+        sqlite3.connect(dbpath).close()
+    info = os.stat(dbpath)
+    return (info.st_dev, info.st_ino)
+
+
+@st.cache_resource(show_spinner="Opening database...", max_entries=1)
+def _load_db(dbpath: str, file_signature):
+    return FrontOfficeDB(dbpath)
+
+
+def get_db(dbpath: str = DBPATH) -> FrontOfficeDB:
+    """Process-wide FrontOfficeDB, built once and rebuilt only if the file is replaced."""
+    shared = _load_db(dbpath, _db_file_signature(dbpath))
+    shared.ensure_schema()
+    return shared
+
+
+def replace_database_file(current: FrontOfficeDB, data: bytes):
+    """Back up the live DB, swap in `data` and drop the shared instance."""
+    dbpath = current.dbpath
+    tmp_path = dbpath + ".uploading"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+
+    # Fold the WAL into the main file so the backup is complete, then let
+    # go of every pooled connection before the file changes underneath them.
+    current.checkpoint()
+    shutil.copy2(dbpath, dbpath + ".backup")
+    current.pool.release()
+    current.close()
+
+    os.replace(tmp_path, dbpath)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(dbpath + suffix):
+            os.remove(dbpath + suffix)
+    _load_db.clear()
+
+
+class ArrivalsWatcher:
+    """Process-wide thread that imports new arrivals files while the app runs.
+
+    Each poll compares the mtimes of ARRIVALS_ROOT and its month folders,
+    which change when a file is added, renamed or removed, and only then
+    looks at the files. Files modified in the last ARRIVALS_SETTLE_SECONDS
+    are left for a later poll so half-copied workbooks are not read.
+    """
+
+    def __init__(self, db: FrontOfficeDB, root: str = None, interval: float = ARRIVALS_POLL_SECONDS,
+                 settle: float = ARRIVALS_SETTLE_SECONDS, full_scan: float = ARRIVALS_FULL_SCAN_SECONDS):
+        self.db = db
+        self.root = root or ARRIVALS_ROOT
+        self.interval = interval
+        self.settle = settle
+        self.full_scan = full_scan
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._signature = None
+        self._last_full_scan = 0.0
+        self._status = {
+            "last_check": None,
+            "last_import": None,
+            "last_rows": 0,
+            "last_files": 0,
+            "errors": [],
+            "waiting": 0,
+        }
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="arrivals-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            return dict(self._status, errors=list(self._status["errors"]))
+
+    def _update(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def _directory_signature(self) -> tuple:
+        signature = []
+        try:
+            signature.append((self.root, os.stat(self.root).st_mtime_ns))
+            for entry in os.scandir(self.root):
+                if entry.is_dir():
+                    signature.append((entry.path, entry.stat().st_mtime_ns))
+        except OSError:
+            return ()
+        return tuple(sorted(signature))
+
+    def _unsettled_files(self) -> int:
+        cutoff = time.time() - self.settle
+        count = 0
+        for path in self.db.list_arrivals_files():
+            try:
+                if os.stat(path).st_mtime > cutoff:
+                    count += 1
+            except OSError:
+                count += 1  # vanished or locked mid-scan; look again next poll
+        return count
+
+    def check_once(self):
+        """One poll: import if the folders changed and every file has settled."""
+        signature = self._directory_signature()
+        now = time.monotonic()
+        due_full_scan = now - self._last_full_scan >= self.full_scan
+        self._update(last_check=datetime.now())
+        if signature == self._signature and not due_full_scan:
+            return
+
+        waiting = self._unsettled_files()
+        self._update(waiting=waiting)
+        if waiting:
+            return  # signature not stored, so the next poll tries again
+
+        # One process at a time is plenty for the few files a day brings
+        result = self.db.import_new_arrivals(workers=1)
+        self._signature = signature
+        self._last_full_scan = now
+        changes = {"errors": [f"{path}: {error}" for path, error in result["errors"]]}
+        if result["files"]:
+            changes.update(last_import=datetime.now(), last_rows=result["rows"], last_files=result["files"])
+        self._update(**changes)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.db.pool.closed:
+                return  # the database file was replaced; a new watcher takes over
+            try:
+                self.check_once()
+            except Exception as e:
+                if self.db.pool.closed:
+                    return
+                self._update(errors=[f"{type(e).__name__}: {e}"])
+            self._stop.wait(self.interval)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _start_arrivals_watcher(dbpath: str, file_signature, _db: FrontOfficeDB) -> ArrivalsWatcher:
+    return ArrivalsWatcher(_db).start()
+
+
+def get_arrivals_watcher(db: FrontOfficeDB):
+    """The process's arrivals watcher for `db`, started on first use; None if disabled."""
+    if not ARRIVALS_WATCHER:
+        return None
+    return _start_arrivals_watcher(db.dbpath, _db_file_signature(db.dbpath), db)
+
+
+def render_arrivals_watcher_status(watcher: ArrivalsWatcher):
+    if watcher is None:
+        return
+    status = watcher.status()
+    if status["last_import"]:
+        st.caption(
+            f"Arrivals imported {status['last_import'].strftime('%d %b %H:%M')}: "
+            f"{status['last_rows']} rows from {status['last_files']} file(s)"
+        )
+    elif status["last_check"]:
+        st.caption(f"Arrivals folder checked {status['last_check'].strftime('%H:%M:%S')}, nothing new")
+    if status["waiting"]:
+        st.caption(f"Waiting for {status['waiting']} file(s) to finish copying")
+    for error in status["errors"][:3]:
+        st.warning(f"Arrivals import: {error}")
+
+
 # =========================
 # Streamlit UI
 # =========================
@@ -1832,35 +3983,126 @@ def page_breakfast():
     col4.metric("Total Guests", int(total_guests))
 
     dfdisplay = dfbreakfast[["room_number", "guest_name", "adults", "children", "total_guests", "meal_plan", "status"]].copy()
-    dfdisplay = clean_numeric_columns(dfdisplay, ["room_number", "adults", "children", "total_guests"])
     dfdisplay.columns = ["Room", "Guest Name", "Adults", "Children", "Total", "Meal Plan", "Status"]
     dfdisplay.insert(0, "#", range(1, len(dfdisplay) + 1))
-    dfdisplay = clean_numeric_columns(dfdisplay, ["Room"])
 
     st.subheader(f"Breakfast for {today.strftime('%d %B %Y')}")
     st.dataframe(dfdisplay, use_container_width=True, hide_index=True)
     st.caption("Print this list for the kitchen.")
 
+HSK_PRIORITIES = ["URGENT", "HIGH", "MEDIUM"]
+
+
+def render_hsk_forecast():
+    """Workload for the coming days by floor and priority, from one forecast query."""
+    col1, col2 = st.columns(2)
+    start = col1.date_input("From", value=date.today(), key="hsk_forecast_start")
+    days = col2.number_input("Days", min_value=1, max_value=31, value=7, step=1, key="hsk_forecast_days")
+
+    df = db.get_hsk_forecast(start, int(days))
+    if df.empty:
+        st.info("No housekeeping tasks in this period.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Tasks", len(df))
+    col2.metric("Checkouts", int((df["task_type"] == "CHECKOUT").sum()))
+    col3.metric("Stayovers", int((df["task_type"] == "STAYOVER").sum()))
+    col4.metric("Arrivals", int((df["task_type"] == "ARRIVAL").sum()))
+
+    day_labels = {d: date.fromisoformat(d).strftime("%a %d %b") for d in df["task_date"].unique()}
+    df["Day"] = df["task_date"].map(day_labels)
+    df["Floor"] = df["floor"].astype("string").fillna("No room")
+
+    st.subheader("Tasks per day and priority")
+    by_priority = (
+        df.groupby(["task_date", "Day", "priority"]).size()
+        .unstack("priority", fill_value=0)
+        .reindex(columns=HSK_PRIORITIES, fill_value=0)
+        .droplevel("task_date")
+    )
+    by_priority["Total"] = by_priority.sum(axis=1)
+    st.dataframe(by_priority, use_container_width=True)
+
+    st.subheader("Tasks per floor")
+    by_floor = df.groupby(["floor", "Floor", "task_date"], dropna=False).size().unstack("task_date", fill_value=0)
+    by_floor = by_floor.rename(columns=day_labels).droplevel("floor")
+    st.dataframe(by_floor, use_container_width=True)
+
+    floor = st.selectbox("Floor detail", list(by_floor.index), key="hsk_forecast_floor")
+    detail = df[df["Floor"] == floor]
+    st.dataframe(
+        detail.groupby(["task_date", "Day", "priority", "task_type"]).size()
+        .rename("Tasks").reset_index().drop(columns="task_date"),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def render_hsk_assignments(task_date: date, tasks: list):
+    """Per-attendant sheets for the day; the plan follows the board as tasks are done."""
+    plan = st.session_state.get("hsk_plan")
+    if plan and plan["date"] != task_date.isoformat():
+        plan = None
+
+    with st.expander("Attendant sheets", expanded=plan is not None):
+        names = st.text_area("Attendants (one per line)", key="hsk_attendants")
+        attendants = [name.strip() for name in names.splitlines() if name.strip()]
+        if st.button("Plan sheets", disabled=not attendants):
+            plan = {
+                "date": task_date.isoformat(),
+                "attendants": attendants,
+                "sheets": plan_hsk_assignments(tasks, len(attendants)),
+            }
+        elif plan is not None:
+            plan["sheets"] = replan_hsk_assignments(plan["sheets"], tasks)
+        st.session_state.hsk_plan = plan
+        if plan is None:
+            st.caption("Enter the attendants on duty and plan the day's sheets.")
+            return
+
+        priority_rank = {p: i for i, p in enumerate(HSK_PRIORITIES)}
+        loads = [sum(t["minutes"] for t in sheet) for sheet in plan["sheets"]]
+        tabs = st.tabs([f"{name} ({load} min)" for name, load in zip(plan["attendants"], loads)])
+        for tab, name, sheet in zip(tabs, plan["attendants"], plan["sheets"]):
+            with tab:
+                if not sheet:
+                    st.caption("Nothing left on this sheet.")
+                    continue
+                # URGENT (checked-out) rooms first, then along the corridor
+                ordered = sorted(sheet, key=lambda t: (priority_rank.get(t["priority"], len(priority_rank)), _hsk_route_key(t)))
+                floors = sorted({f for f in room_floors(pd.Series([t["room"] for t in sheet])).dropna()})
+                st.caption("Floors: " + (", ".join(str(f) for f in floors) or "-"))
+                st.dataframe(
+                    pd.DataFrame([
+                        {
+                            "Room": t["room"],
+                            "Type": t["tasktype"],
+                            "Priority": t["priority"],
+                            "Minutes": t["minutes"],
+                            "Notes": " | ".join(t["notes"]),
+                        }
+                        for t in ordered
+                    ]),
+                    use_container_width=True,
+                    hide_index=True,
+                )
+
+
 def page_housekeeping():
     st.header("Housekeeping Task List")
+    if st.radio("View", ["Day", "Forecast"], horizontal=True, key="hsk_view") == "Forecast":
+        render_hsk_forecast()
+        return
     today = st.date_input("Date", value=date.today(), key="hsk_date")
     
+    # Tasks come with their saved Status / HSK Notes
     tasks = db.generate_hsk_tasks_for_date(today)
     
     if not tasks:
         st.info("No housekeeping tasks for this date.")
         return
     
-    # Get existing statuses and merge with tasks
-    for task in tasks:
-        status_data = db.get_hsk_task_status(today, task["room"], task["tasktype"])
-        if status_data:
-            task["Status"] = status_data["status"]
-            task["HSK Notes"] = status_data["notes"] or ""
-        else:
-            task["Status"] = "PENDING"
-            task["HSK Notes"] = ""
-    
     # Summary metrics
     col1, col2, col3, col4, col5 = st.columns(5)
     col1.metric("Total Tasks", len(tasks))
@@ -1874,7 +4116,7 @@ def page_housekeeping():
     df_tasks = pd.DataFrame([
         {
             "#": idx,
-            "Room": format_room_number(t["room"]),
+            "Room": t["room"],
             "Type": t["tasktype"],
             "Priority": t["priority"],
             "Task": t["description"],
@@ -1885,45 +4127,42 @@ def page_housekeeping():
         for idx, t in enumerate(tasks, 1)
     ])
     
-    # Display editable table
+    render_hsk_assignments(today, tasks)
+
+    # Display editable table; inside a form, edits only rerun the page on Save
     st.subheader("Task Tracking")
-    edited_df = st.data_editor(
-        df_tasks,
-        use_container_width=True,
-        hide_index=True,
-        disabled=["#", "Room", "Type", "Priority", "Task", "Notes"],  # Only Status and HSK Notes are editable
-        column_config={
-            "Status": st.column_config.SelectboxColumn(
-                "Status",
-                options=["PENDING", "DONE"],
-                required=True
-            ),
-            "HSK Notes": st.column_config.TextColumn(
-                "HSK Notes",
-                help="Add notes here (e.g., 'Cleaned', 'Extra towels needed')",
-                max_chars=200
-            )
-        }
-    )
-    
-    # Save button
-    col1, col2 = st.columns([1, 4])
-    with col1:
-        if st.button("Save", type="primary", use_container_width=True):
-            # Save each task status
-             for idx, row in edited_df.iterrows():
-                original_task = tasks[idx]
-                db.update_hsk_task_status(
-                    today,
-                    original_task["room"],
-                    original_task["tasktype"],
-                    row["Status"],
-                    row["HSK Notes"],
+    with st.form("hsk_tasks_form", border=False):
+        edited_df = st.data_editor(
+            df_tasks,
+            use_container_width=True,
+            hide_index=True,
+            disabled=["#", "Room", "Type", "Priority", "Task", "Notes"],  # Only Status and HSK Notes are editable
+            column_config={
+                "Status": st.column_config.SelectboxColumn(
+                    "Status",
+                    options=["PENDING", "DONE"],
+                    required=True
+                ),
+                "HSK Notes": st.column_config.TextColumn(
+                    "HSK Notes",
+                    help="Add notes here (e.g., 'Cleaned', 'Extra towels needed')",
+                    max_chars=200
                 )
+            }
+        )
 
-                # If checkout cleaning task is DONE, mark room as CLEAN
-                if original_task["tasktype"] == "CHECKOUT" and row["Status"] == "DONE":
-                    db.set_room_status(original_task["room"], "CLEAN")
+        # Save button
+        col1, col2 = st.columns([1, 4])
+        with col1:
+            saved = st.form_submit_button("Save", type="primary", use_container_width=True)
+    if saved:
+        # Save changed task statuses; DONE checkouts mark the room CLEAN
+        changed = db.save_hsk_task_edits(today, df_tasks, edited_df)
+        # Rerun so the attendant sheets drop the tasks just marked DONE
+        st.session_state.hsk_saved = f"{changed} task(s) updated."
+        st.rerun()
+    if "hsk_saved" in st.session_state:
+        st.success(st.session_state.pop("hsk_saved"))
 
     
     # Download CSV
@@ -1954,6 +4193,13 @@ def page_arrivals():
         st.info("No arrivals for this date.")
         return
 
+    vanished = [r for r in rows if r.get("vanished_at")]
+    if vanished:
+        st.warning(
+            "Missing from the latest PMS export (possibly cancelled): "
+            + ", ".join(f"{r['guest_name']} (#{r['reservation_no']})" for r in vanished)
+        )
+
     # --- Filter panel as its own expander ---
     with st.expander("Filters for this date", expanded=True):
         col_filter_status, col_filter_search = st.columns([2, 2])
@@ -2184,8 +4430,6 @@ def page_inhouse_list():
         for r in inhouse_rows
     ])
 
-    df_inhouse = clean_numeric_columns(df_inhouse, ["reservation_id", "Room"])
-
     st.caption(f"{len(df_inhouse)} guests in-house")
 
     edited_df = st.data_editor(
@@ -2209,11 +4453,8 @@ def page_inhouse_list():
     )
 
     if st.button("Save meal plans", type="primary", use_container_width=True):
-        for _, row in edited_df.iterrows():
-            reservation_id = int(row["reservation_id"])
-            mealplan = row["Meal Plan"] or ""
-            db.update_reservation_mealplan(reservation_id, mealplan)
-        st.success("Meal plans updated.")
+        changed = db.save_mealplan_edits(df_inhouse, edited_df)
+        st.success(f"Meal plans updated ({changed} changed).")
         st.rerun()
 
     # Cancel check-in section (unchanged)
@@ -2273,7 +4514,6 @@ def page_checkout_list():
             "Departure": r["checkout_planned"],
             "Status": r["status"]
         } for r in dep_rows])
-        df_dep = clean_numeric_columns(df_dep, ["Room"])
         st.dataframe(df_dep, use_container_width=True, hide_index=True)
         
         st.subheader("Quick checkout")
@@ -2293,7 +4533,7 @@ def page_checkout_list():
                         background-color: #f9f9f9;
                         margin-bottom: 8px;
                     ">
-                        <strong style="font-size: 16px;">{idx}. Room {format_room_number(row_dict['room_number'])} - {row_dict['guest_name']}</strong>
+                        <strong style="font-size: 16px;">{idx}. Room {row_dict['room_number']} - {row_dict['guest_name']}</strong>
                     </div>
                     """, unsafe_allow_html=True)
                 
@@ -2321,7 +4561,6 @@ def page_checkout_list():
             "Planned": r["checkout_planned"],
             "Actual": r["checkout_actual"]
         } for r in checkout_rows])
-        df_checkout = clean_numeric_columns(df_checkout, ["Room"])
         st.dataframe(df_checkout, use_container_width=True, hide_index=True)
         st.caption(f"{len(df_checkout)} completed check-outs")
         
@@ -2363,30 +4602,17 @@ def page_tasks_handover():
     if df.empty:
         st.info("No Handovers.")
     else:
+        df_view = df[["id", "task_date", "title", "created_by", "assigned_to", "comment"]]
         df_edit = st.data_editor(
-            df[["id", "task_date", "title", "created_by", "assigned_to", "comment"]],
+            df_view,
             hide_index=True,
             disabled=["id", "task_date"],
             use_container_width=True,
         )
 
         if st.button("Save changes", type="primary"):
-            for _, row in df_edit.iterrows():
-                db.execute(
-                    """
-                    UPDATE tasks
-                    SET title = ?, created_by = ?, assigned_to = ?, comment = ?
-                    WHERE id = ?
-                    """,
-                    (
-                        row["title"],
-                        row["created_by"],
-                        row["assigned_to"],
-                        row["comment"],
-                        row["id"],
-                    ),
-                )
-            st.success("Handover updated.")
+            changed = db.save_task_edits(df_view, df_edit)
+            st.success(f"Handover updated ({changed} changed).")
             st.rerun()
 
 
@@ -2470,24 +4696,23 @@ def page_no_shows():
 
 
 
+# Columns each full-text search type looks in; Room Number is an exact lookup instead
+SEARCH_TYPES = {
+    "Guest Name": ("guest_name",),
+    "Reservation No": ("reservation_no",),
+    "Main Client": ("main_client",),
+    "Channel": ("channel",),
+    "All Fields": None,
+}
+
+
 def page_search():
     st.header("Search Reservations")
     
     col1, col2 = st.columns([1, 3])
     
     with col1:
-        search_type = st.selectbox(
-            "Search by",
-            [
-                
-                "Room Number",
-                "Guest Name",
-                "Reservation No",
-                "Main Client",
-                "Channel",
-                "All Fields"
-            ]
-        )
+        search_type = st.selectbox("Search by", ["Room Number", *SEARCH_TYPES])
     
     with col2:
         q = st.text_input(
@@ -2498,57 +4723,18 @@ def page_search():
     
     if not q:
         st.info("Enter a search term to find reservations.")
+        st.caption(
+            "Words match from their start (smi finds Smith). Limit a word to a field with "
+            "field:word, e.g. guest:smith channel:booking remark:vip email:gmail."
+        )
         return
     
-    # Build query based on search type
-    like_pattern = f"%{q}%"
-    
     if search_type == "Room Number":
-        room_number = q.strip()
-        rows = db.search_reservations_by_room_number(room_number)
-
-    elif search_type == "Guest Name":
-        rows = db.fetch_all(
-            """
-            SELECT * FROM reservations
-            WHERE guest_name LIKE ?
-            ORDER BY arrival_date DESC
-            LIMIT 500
-            """,
-            (like_pattern,),
-        )
-    elif search_type == "Reservation No":
-        rows = db.fetch_all(
-            """
-            SELECT * FROM reservations
-            WHERE reservation_no LIKE ?
-            ORDER BY arrival_date DESC
-            LIMIT 500
-            """,
-            (like_pattern,),
-        )
-    elif search_type == "Main Client":
-        rows = db.fetch_all(
-            """
-            SELECT * FROM reservations
-            WHERE main_client LIKE ?
-            ORDER BY arrival_date DESC
-            LIMIT 500
-            """,
-            (like_pattern,),
-        )
-    elif search_type == "Channel":
-        rows = db.fetch_all(
-            """
-            SELECT * FROM reservations
-            WHERE channel LIKE ?
-            ORDER BY arrival_date DESC
-            LIMIT 500
-            """,
-            (like_pattern,),
-        )
-    else:  # All Fields
-        rows = db.search_reservations(q)
+        # Exact canonical match: 101 and 101.0 find room 101, never 1012
+        rows = db.search_reservations_by_room_number(q)
+    else:
+        # Word-prefix search on the full-text index, limited to the chosen field
+        rows = db.search_reservations(q, SEARCH_TYPES[search_type])
     
     # Display results
     if not rows:
@@ -2609,7 +4795,6 @@ def page_search():
     
     # Create display DataFrame
     df = pd.DataFrame([dict(r) for r in rows])
-    df_clean = clean_numeric_columns(df, ["room_number", "reservation_no"])
     
     # Select and format columns for display
     display_cols = [
@@ -2618,10 +4803,10 @@ def page_search():
     ]
     
     # Only show columns that exist
-    display_cols = [col for col in display_cols if col in df_clean.columns]
+    display_cols = [col for col in display_cols if col in df.columns]
     
     st.dataframe(
-        df_clean[display_cols],
+        df[display_cols],
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -2641,7 +4826,7 @@ def page_search():
     with st.expander("📋 View Full Details"):
         for idx, row in enumerate(rows, 1):
             with st.container():
-                st.markdown(f"### {idx}. {row['guest_name']} - Room {format_room_number(row.get('room_number', 'Not assigned'))}")
+                st.markdown(f"### {idx}. {row['guest_name']} - Room {row.get('room_number') or 'Not assigned'}")
                 
                 col1, col2, col3, col4 = st.columns(4)
                 col1.write(f"**Arrival:** {format_date(row['arrival_date'])}")
@@ -2666,15 +4851,12 @@ def page_room_list():
     st.header("Room List")
     st.caption("Manage room inventory and room status (CLEAN / DIRTY / VACANT / OCCUPIED)")
 
-    df = db.read_table("rooms")
+    df = pd.DataFrame(db.fetch_all("SELECT room_number, status FROM rooms ORDER BY room_key"))
     if df.empty:
         st.info("No rooms yet (should have been seeded).")
         return
 
     df_display = df[["room_number", "status"]].copy()
-    df_display = df_display.sort_values(
-        by="room_number", key=lambda s: pd.to_numeric(s, errors="coerce")
-    )
     df_display.columns = ["Room", "Status"]
 
     st.subheader("Rooms")
@@ -2692,11 +4874,8 @@ def page_room_list():
     )
 
     if st.button("Save room statuses", type="primary", use_container_width=True):
-        for _, row in edited.iterrows():
-            rn = str(row["Room"]).strip()
-            status = row["Status"]
-            db.set_room_status(rn, status)
-        st.success("Room statuses updated.")
+        changed = db.save_room_status_edits(df_display, edited)
+        st.success(f"Room statuses updated ({changed} changed).")
         st.rerun()
 
     st.caption(f"Total: {len(df)} rooms")
@@ -2754,9 +4933,9 @@ def page_parking():
     
     inhouse_dicts = [dict(r) for r in inhouse]
     
-    # Filter: has parking_space OR "parking" mentioned in notes
-    guests_with_parking = [r for r in inhouse_dicts if r.get("parking_space") or (r.get("comment") and ("parking" in r.get("comment", "").lower() or "poa" in r.get("comment", "").lower()))]
-    guests_without_parking = [r for r in inhouse_dicts if r not in guests_with_parking]
+    # Filter: has parking_space OR parking flagged in the stay comment
+    guests_with_parking = [r for r in inhouse_dicts if r.get("parking_space") or r.get("flag_parking")]
+    guests_without_parking = [r for r in inhouse_dicts if not (r.get("parking_space") or r.get("flag_parking"))]
     
     col1, col2 = st.columns(2)
     col1.metric("Total In-House", len(inhouse_dicts))
@@ -2771,7 +4950,6 @@ def page_parking():
             "Plate": r.get("parking_plate", ""),
             "Notes": r.get("comment", "") or r.get("parking_notes", "")
         } for r in guests_with_parking])
-        df_parking = clean_numeric_columns(df_parking, ["Room"]) 
         st.dataframe(df_parking, use_container_width=True, hide_index=True)
     else:
         st.info("No parking spaces assigned yet.")
@@ -2819,6 +4997,19 @@ def page_db_viewer():
     col4.metric("Tasks", tasks_count['cnt'])
     col5.metric("No Shows", no_shows_count['cnt'])
     col6.metric("Spare Rooms", spare_count['cnt'])
+
+    pending = db.migrate(dry_run=True)
+    st.caption(
+        f"Schema version {db.schema_version()} of {SCHEMA_VERSION}"
+        + (" | pending: " + ", ".join(f"{v} {d}" for v, d in pending) if pending else " | up to date")
+    )
+
+    pool = db.pool_stats()
+    st.caption(
+        f"Connection pool: {pool['open']}/{pool['max_size']} open, {pool['in_use']} in use, "
+        f"{pool['idle']} idle | {pool['waits']} waits, "
+        f"{pool['total_wait_ms']:.0f} ms total wait (max {pool['max_wait_ms']:.0f} ms)"
+    )
     
     st.divider()
     
@@ -2850,7 +5041,7 @@ def page_db_viewer():
     else:
         # Clean numeric columns
         if table == "reservations":
-            df = clean_numeric_columns(df, ["id", "reservation_no", "adults", "children", "total_guests", "nights"])
+            df = clean_numeric_columns(df, ["id", "adults", "children", "total_guests", "nights"])
         elif table == "stays":
             df = clean_numeric_columns(df, ["id", "reservation_id"])
         elif table == "tasks":
@@ -2884,7 +5075,51 @@ def page_db_viewer():
             type="primary"
         )
         st.success(f"Database size: {len(backup_data)/1024:.1f} KB")
-        
+
+
+def page_query_profiling():
+    st.subheader("Query Profiling")
+    st.caption("Times every statement run through fetch_all / fetch_one / execute. Leave off when not investigating.")
+
+    col1, col2 = st.columns([1, 2])
+    enabled = col1.toggle("Profile queries", value=db.profiler is not None)
+    slow_ms = col2.number_input(
+        "Slow query threshold (ms)",
+        min_value=1.0,
+        value=float(db.profiler.slow_ms if db.profiler else SLOW_QUERY_MS),
+        step=10.0,
+    )
+    if enabled:
+        profiler = db.enable_profiling(slow_ms=slow_ms)
+    else:
+        db.disable_profiling()
+        st.info(f"Profiling is off. Slow queries are logged to {SLOW_QUERY_LOG} while it is on.")
+        return
+
+    if st.button("Reset statistics"):
+        profiler.reset()
+
+    stats = profiler.statement_stats()
+    if not stats:
+        st.info("No statements recorded yet - open a page and come back.")
+        return
+
+    st.markdown("**Statements** (slowest p95 first)")
+    st.dataframe(pd.DataFrame(stats), use_container_width=True, hide_index=True)
+
+    st.markdown("**Recent page renders**")
+    st.dataframe(pd.DataFrame(profiler.render_stats()), use_container_width=True, hide_index=True)
+
+    slow = profiler.slow_queries()
+    st.markdown(f"**Slow queries** (>= {profiler.slow_ms:.0f} ms, also written to {profiler.log_path})")
+    if not slow:
+        st.caption("None yet.")
+    for entry in slow[:20]:
+        with st.expander(f"{entry['ms']:.1f} ms | {entry['caller']} | {entry['at']}"):
+            st.code(entry["sql"], language="sql")
+            st.code("\n".join(entry["plan"]))
+
+
 def page_invoices():
     """
     Invoice generation page matching exact Excel template format.
@@ -3926,7 +6161,9 @@ def page_admin_upload():
         st.warning("Enter admin password to access this page")
         return
     
-    tab1, tab2, tab3 = st.tabs(["Upload Full DB", "Upload Stays CSV", "Download DB"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Upload Full DB", "Upload Stays CSV", "Download DB", "Query Profiling", "Arrivals Import"]
+    )
     
     with tab1:
         st.subheader("Replace Entire Database")
@@ -3939,14 +6176,8 @@ def page_admin_upload():
             
             if st.button("Replace Database", type="primary"):
                 try:
-                    # Backup current DB first
-                    import shutil
-                    backup_path = DBPATH + ".backup"
-                    shutil.copy2(DBPATH, backup_path)
-                    
-                    # Replace with uploaded
-                    with open(DBPATH, 'wb') as f:
-                        f.write(uploaded_db.getbuffer())
+                    # Backs up the current DB, replaces it and drops the shared instance
+                    replace_database_file(db, uploaded_db.getbuffer())
                     
                     st.success("✅ Database replaced successfully!")
                     st.info("Reloading app...")
@@ -3962,51 +6193,41 @@ def page_admin_upload():
         uploaded_csv = st.file_uploader("Upload stays CSV", type=['csv'], key="csv_upload")
         
         if uploaded_csv:
-            import pandas as pd
-            df = pd.read_csv(uploaded_csv)
-            
-            st.write(f"**Preview:** {len(df)} rows")
-            st.dataframe(df.head(10))
+            preview = pd.read_csv(uploaded_csv, nrows=10)
+            uploaded_csv.seek(0)
+
+            st.write("**Preview:** first 10 rows")
+            st.dataframe(preview)
             
             st.write("**Expected columns:** `id, reservation_id, room_number, status, checkin_planned, checkout_planned, checkin_actual, checkout_actual, parking_space, parking_plate, parking_notes`")
             
             if st.button("Import Stays", type="primary"):
                 try:
-                    with st.spinner("Importing stays..."):
-                        count = 0
-                        for _, row in df.iterrows():
-                            db.execute(
-                                """
-                                INSERT OR REPLACE INTO stays (
-                                    id, reservation_id, room_number, status,
-                                    checkin_planned, checkout_planned,
-                                    checkin_actual, checkout_actual,
-                                    parking_space, parking_plate, parking_notes
-                                )
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                                """,
-                                (
-                                    row.get("id"),
-                                    row.get("reservation_id"),
-                                    row.get("room_number"),
-                                    row.get("status", "CHECKED_IN"),
-                                    row.get("checkin_planned"),
-                                    row.get("checkout_planned"),
-                                    row.get("checkin_actual"),
-                                    row.get("checkout_actual"),
-                                    row.get("parking_space", ""),
-                                    row.get("parking_plate", ""),
-                                    row.get("parking_notes", ""),
-                                ),
-                            )
-                            count += 1
-                        
-                        st.success(f"✅ Imported {count} stays")
-                    
-                    # 1. Update room statuses based on stays
-                    with st.spinner("Syncing room statuses..."):
-                        db.sync_room_status_from_stays()
-                        st.success("✅ Room statuses synced")
+                    bar = st.progress(0.0, text="Importing stays...")
+                    total = max(1, uploaded_csv.size)
+
+                    def report(rows_read, imported, rejected):
+                        # Rows are not known up front; the byte position is close enough
+                        bar.progress(
+                            min(1.0, uploaded_csv.tell() / total),
+                            text=f"Read {rows_read} rows: {imported} imported, {rejected} rejected",
+                        )
+
+                    # One transaction: stays and the room status resync land together or not at all
+                    result = db.import_stays_csv(uploaded_csv, progress=report)
+                    bar.progress(1.0, text="Done")
+                    st.success(f"✅ Imported {result['imported']} stays, room statuses synced")
+
+                    if result["rejected"]:
+                        st.warning(f"⚠️ {len(result['rejected'])} row(s) rejected")
+                        rejected_df = pd.DataFrame(result["rejected"])
+                        st.dataframe(rejected_df, use_container_width=True, hide_index=True)
+                        st.download_button(
+                            "Download rejected rows",
+                            data=rejected_df.to_csv(index=False),
+                            file_name="stays_rejected.csv",
+                            mime="text/csv",
+                        )
                     
                     # 2. Verify linkage between stays and reservations
                     with st.spinner("Verifying data linkage..."):
@@ -4040,10 +6261,10 @@ def page_admin_upload():
                             SELECT COUNT(*) as cnt
                             FROM reservations r
                             LEFT JOIN stays s ON s.reservation_id = r.id
-                            WHERE date(r.depart_date) = date(?)
+                            WHERE r.depart_date >= ? AND r.depart_date < ?
                             AND (s.status IS NULL OR s.status != 'CHECKED_OUT')
                             """,
-                            (today.isoformat(),)
+                            day_bounds(today)
                         )
                         
                         st.info(f"""
@@ -4055,8 +6276,9 @@ def page_admin_upload():
                         """)
                     
                     st.success("🎉 Stays imported successfully!")
-                    time.sleep(2)
-                    st.rerun()
+                    if not result["rejected"]:
+                        time.sleep(2)
+                        st.rerun()
                     
                 except Exception as e:
                     st.error(f"❌ Error importing: {str(e)}")
@@ -4069,7 +6291,6 @@ def page_admin_upload():
             try:
                 import zipfile
                 import io
-                import pandas as pd
                 
                 with st.spinner("Creating download package..."):
                     zip_buffer = io.BytesIO()
@@ -4119,6 +6340,58 @@ def page_admin_upload():
         st.subheader("Database Viewer")
         page_db_viewer()
 
+    with tab4:
+        page_query_profiling()
+
+    with tab5:
+        st.subheader("Import New Arrivals Files")
+        st.caption(f"Only files under {ARRIVALS_ROOT} that are new or changed since the last import are read.")
+
+        manifest = db.import_manifest_summary()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Files tracked", manifest["files"])
+        col2.metric("Rows imported", manifest["rows"])
+        col3.metric("Failed files", manifest["errors"] or 0)
+        col4.metric("Last import", (manifest["last_import"] or "-")[:16])
+
+        workers = st.number_input(
+            "Parser workers", min_value=1, max_value=os.cpu_count() or 1, value=IMPORT_WORKERS,
+            help="Workbooks are parsed in parallel; one writer commits them in batches.",
+        )
+        if st.button("Import new files", type="primary"):
+            with st.spinner("Checking arrivals folder..."):
+                result = db.import_new_arrivals(workers=int(workers))
+            rate = f" ({result['files_per_s']} files/s)" if result["files_per_s"] else ""
+            st.success(f"Imported {result['rows']} reservations from {result['files']} file(s){rate}.")
+            for path, error in result["errors"]:
+                st.error(f"{path}: {error}")
+
+        failed = db.fetch_all(
+            "SELECT path, error, imported_at FROM import_manifest WHERE status = 'ERROR' ORDER BY path"
+        )
+        if failed:
+            st.dataframe(pd.DataFrame(failed), use_container_width=True, hide_index=True)
+
+        st.markdown("**Rejected rows**")
+        rejects = db.fetch_all(
+            """
+            SELECT rejected_at, source, reservation_no, arrival_date, guest_name, room_number, reason
+            FROM import_rejects ORDER BY id DESC LIMIT 500
+            """
+        )
+        if rejects:
+            st.dataframe(pd.DataFrame(rejects), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No rows rejected by the last imports.")
+
+        st.markdown("**Recent changes between exports**")
+        change_type = st.selectbox("Change", ["All", "NEW", "AMENDED", "VANISHED"], key="change_type")
+        changes = db.get_reservation_changes(change_type=None if change_type == "All" else change_type)
+        if changes:
+            st.dataframe(pd.DataFrame(changes), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No changes recorded yet.")
+
 
 
 def main():
@@ -4136,9 +6409,10 @@ def main():
     "Admin Upload": page_admin_upload,  # Add this
 }
 
-    # Initialize database here (after set_page_config)
+    # Shared across sessions; only built on first run or after the DB file is replaced
     global db
-    db = FrontOfficeDB(DBPATH)
+    db = get_db(DBPATH)
+    watcher = get_arrivals_watcher(db)
 
 
 
@@ -4173,9 +6447,13 @@ def main():
 
 
         st.markdown("---")
+        render_arrivals_watcher_status(watcher)
         st.caption("Sponsored by **TwoTable.**")
         st.caption("www.twotable.co.uk")
 
+    if db.profiler is not None:
+        db.profiler.begin_render(page)
+
     if page == "Arrivals":
         page_arrivals()
     elif page == "In-House List":
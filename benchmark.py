@@ -0,0 +1,421 @@
+"""Benchmark suite for FrontOfficeDB on a synthetic hotel dataset.
+
+Builds a throwaway database of realistic size, times the read methods the
+pages call, the arrivals import path and the front-desk write actions, and
+writes the timings as JSON so two runs can be compared.
+
+    python benchmark.py --years 10 --rooms 500 --out bench.json
+    python benchmark.py --rooms 2000 --compare bench.json --tolerance 1.25
+
+Never point it at the live database: it always works on its own file.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+import pandas as pd
+
+import app
+
+# Streamlit warns about a missing ScriptRunContext on every st.* call outside `streamlit run`
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+
+FIRST_NAMES = ["JOHN", "SARAH", "DAVID", "EMMA", "JAMES", "OLIVIA", "MICHAEL", "SOPHIE",
+               "DANIEL", "CHLOE", "THOMAS", "LUCY", "AHMED", "PRIYA", "MARCO", "ANNA"]
+LAST_NAMES = ["SMITH", "JONES", "TAYLOR", "BROWN", "WILLIAMS", "WILSON", "JOHNSON", "DAVIES",
+              "PATEL", "KHAN", "ROSSI", "MULLER", "EVANS", "THOMAS", "ROBERTS", "WALKER"]
+CLIENTS = ["BOOKING.COM", "EXPEDIA", "DIRECT", "HOTELBEDS", "AIRBUS UK", "UNIVERSITY OF BRISTOL",
+           "ROLLS ROYCE", "CORPORATE TRAVEL LTD"]
+CHANNELS = ["OTA", "GDS", "WEB", "PHONE", "WALK-IN"]
+MEAL_PLANS = ["RO", "BB", "BB", "BB", "HB", "RO+BB", "FB"]
+ROOM_TYPES = ["DBL", "TWN", "KING", "SUITE"]
+REMARKS = ["", "", "", "2T", "VIP guest", "Birthday - cake in room", "Parking required",
+           "Late arrival", "Accessible room please", "Quiet room high floor", "2T extra pillows"]
+STATUS_WEIGHTS = (("CONFIRMED", 88), ("CANCELLED", 7), ("NO_SHOW", 5))
+
+
+def scaled_room_blocks(rooms: int) -> list:
+    """ROOM_BLOCKS truncated or extended with extra 10-room floors to `rooms` rooms."""
+    blocks = []
+    remaining = rooms
+    for start, end in app.ROOM_BLOCKS:
+        if remaining <= 0:
+            break
+        size = min(end - start + 1, remaining)
+        blocks.append((start, start + size - 1))
+        remaining -= size
+    floor = app.ROOM_BLOCKS[-1][0] // 100 + 1
+    while remaining > 0:
+        size = min(10, remaining)
+        blocks.append((floor * 100, floor * 100 + size - 1))
+        remaining -= size
+        floor += 1
+    return blocks
+
+
+def _weighted_status(rng: random.Random) -> str:
+    roll = rng.randrange(100)
+    for status, weight in STATUS_WEIGHTS:
+        if roll < weight:
+            return status
+        roll -= weight
+    return "CONFIRMED"
+
+
+def generate_dataset(db: app.FrontOfficeDB, years: int, rooms: list, today: date, seed: int = 42) -> dict:
+    """Fill db with reservations, stays, no-shows and payments; returns row counts.
+
+    Every room gets back-to-back bookings of 1-7 nights with short gaps, from
+    `years` years before `today` to 90 days after it. Bookings that started
+    before today have stays (CHECKED_OUT, or CHECKED_IN if still in-house).
+    """
+    rng = random.Random(seed)
+    start = today - timedelta(days=365 * years)
+    end = today + timedelta(days=90)
+
+    reservations = []
+    for room in rooms:
+        d = start + timedelta(days=rng.randrange(3))
+        while d < end:
+            nights = rng.choice((1, 1, 2, 2, 3, 3, 4, 5, 7))
+            status = _weighted_status(rng)
+            guest = f"{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}"
+            remark = rng.choice(REMARKS)
+            adults = rng.choice((1, 1, 2, 2, 2, 3))
+            reservations.append((
+                d.isoformat(), (d + timedelta(days=nights)).isoformat(), str(room),
+                rng.choice(ROOM_TYPES), adults, 0, adults, str(1_000_000 + len(reservations)),
+                guest, rng.choice(CLIENTS), nights, rng.choice(MEAL_PLANS), f"RATE{rng.randrange(20)}",
+                rng.choice(CHANNELS), remark, rng.choice(("", "", "Cot required")),
+                guest.split(",")[0].title(), f"guest{len(reservations)}@example.com", status,
+            ))
+            d += timedelta(days=nights + rng.choice((0, 0, 0, 1, 1, 2, 3)))
+
+    with db.transaction() as c:
+        c.executemany(
+            """
+            INSERT INTO reservations (
+                arrival_date, depart_date, room_number, room_type_code, adults, children,
+                total_guests, reservation_no, guest_name, main_client, nights, meal_plan,
+                rate_code, channel, main_remark, total_remarks, contact_name, contact_email,
+                reservation_status
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            reservations,
+        )
+        today_iso = today.isoformat()
+        c.execute(
+            """
+            INSERT INTO stays (reservation_id, room_number, status, checkin_planned, checkout_planned,
+                               checkin_actual, checkout_actual)
+            SELECT id, room_number,
+                   CASE WHEN depart_date <= ? THEN 'CHECKED_OUT' ELSE 'CHECKED_IN' END,
+                   arrival_date, depart_date, arrival_date || ' 15:00:00',
+                   CASE WHEN depart_date <= ? THEN depart_date || ' 11:00:00' END
+            FROM reservations
+            WHERE reservation_status = 'CONFIRMED' AND arrival_date <= ?
+            """,
+            (today_iso, today_iso, today_iso),
+        )
+        c.execute(
+            """
+            INSERT INTO no_shows (arrival_date, guest_name, main_client, charged, amount_charged, amount_pending, comment)
+            SELECT arrival_date, guest_name, main_client, id % 2, 95.0 * (id % 2), 95.0 * (1 - id % 2), ''
+            FROM reservations
+            WHERE reservation_status = 'NO_SHOW' AND arrival_date <= ?
+            """,
+            (today_iso,),
+        )
+        c.execute(
+            """
+            INSERT INTO payments (reservation_id, guest_name, amount, type, method, reference, note)
+            SELECT id, guest_name, 80.0 * nights, 'PAYMENT', 'CARD', reservation_no, ''
+            FROM reservations
+            WHERE reservation_status = 'CONFIRMED' AND arrival_date <= ? AND id % 3 = 0
+            """,
+            (today_iso,),
+        )
+    db.seed_rooms_from_blocks()
+    db.sync_room_status_from_stays()
+    db.execute("ANALYZE")
+
+    return {
+        table: db.fetch_one(f"SELECT COUNT(*) AS cnt FROM {table}")["cnt"]
+        for table in ("reservations", "stays", "no_shows", "payments", "rooms")
+    }
+
+
+def write_arrivals_files(db: app.FrontOfficeDB, folder: str, days: list) -> list:
+    """Write one 'Arrivals DD.MM.YYYY.XLSX' per day in the PMS export layout."""
+    paths = []
+    for d in days:
+        rows = db.get_arrivals_for_date(d)
+        df = pd.DataFrame({
+            "Arrival Date": [r["arrival_date"] for r in rows],
+            "Depart": [r["depart_date"] for r in rows],
+            "Room": [r["room_number"] for r in rows],
+            "Room type": [r["room_type_code"] for r in rows],
+            "AD": [r["adults"] for r in rows],
+            "Tot. guests": [r["total_guests"] for r in rows],
+            "Reservation No.": [r["reservation_no"] for r in rows],
+            "Guest or Group's name": [r["guest_name"] for r in rows],
+            "Main client": [r["main_client"] for r in rows],
+            "Nights": [r["nights"] for r in rows],
+            "Meal Plan": [r["meal_plan"] for r in rows],
+            "Rate": [r["rate_code"] for r in rows],
+            "Chanl": [r["channel"] for r in rows],
+            "Main Rem.": [r["main_remark"] for r in rows],
+            "Contact person": [r["contact_name"] for r in rows],
+            "E-mail": [r["contact_email"] for r in rows],
+            "Source of Business": ["" for _ in rows],
+        })
+        # The PMS writes an upper-case .XLSX extension, which pandas will not write to directly
+        buffer = BytesIO()
+        df.to_excel(buffer, index=False, engine="xlsxwriter")
+        path = os.path.join(folder, f"Arrivals {d.strftime('%d.%m.%Y')}.XLSX")
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+        paths.append(path)
+    return paths
+
+
+def time_call(fn, repeat: int) -> dict:
+    """Run fn `repeat` times; timing summary in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "n": len(times),
+        "min_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(times[-1], 3),
+    }
+
+
+def bench_reads(db: app.FrontOfficeDB, days: list, repeat: int) -> dict:
+    cycle = iter(days * (repeat * 2))
+    next_day = lambda: next(cycle)  # noqa: E731 - spread calls over the sample days
+    cases = {
+        "get_arrivals_for_date": lambda: db.get_arrivals_for_date(next_day()),
+        "get_inhouse": lambda: db.get_inhouse(next_day()),
+        "get_departures_for_date": lambda: db.get_departures_for_date(next_day()),
+        "get_checked_out_for_date": lambda: db.get_checked_out_for_date(next_day()),
+        "get_full_breakfast_for_date": lambda: db.get_full_breakfast_for_date(next_day()),
+        "get_breakfast_list_for_date": lambda: db.get_breakfast_list_for_date(next_day()),
+        "get_guests_for_date": lambda: db.get_guests_for_date(next_day()),
+        "get_reservations_for_date": lambda: db.get_reservations_for_date(next_day()),
+        "get_potential_no_shows": lambda: db.get_potential_no_shows(next_day()),
+        "get_no_shows_for_date": lambda: db.get_no_shows_for_date(next_day()),
+        "generate_hsk_tasks_for_date": lambda: db.generate_hsk_tasks_for_date(next_day()),
+        "search_reservations (name)": lambda: db.search_reservations("SMITH"),
+        "search_reservations (reservation no)": lambda: db.search_reservations("1000123"),
+        "search_reservations_by_room_number": lambda: db.search_reservations_by_room_number("305"),
+        "get_all_payments": lambda: db.get_all_payments(),
+        "get_all_rooms": lambda: db.get_all_rooms(),
+        "export_arrivals_excel": lambda: db.export_arrivals_excel(next_day()),
+        "export_inhouse_excel": lambda: db.export_inhouse_excel(next_day()),
+    }
+    return {name: time_call(fn, repeat) for name, fn in cases.items()}
+
+
+def bench_import(db: app.FrontOfficeDB, paths: list) -> dict:
+    frames = [pd.read_excel(path) for path in paths]
+    rows = sum(len(df) for df in frames)
+    results = {
+        "read_excel (per file)": time_call(lambda: pd.read_excel(paths[0]), len(paths)),
+        "build_reservations_from_df (per file)": time_call(
+            lambda: db.build_reservations_from_df(frames[0].copy()), len(paths)
+        ),
+    }
+    start = time.perf_counter()
+    imported = sum(db.import_arrivals_file(path) for path in paths)
+    elapsed = time.perf_counter() - start
+    results["import_arrivals_file (all files)"] = {
+        "n": len(paths),
+        "files": len(paths),
+        "rows": rows,
+        "imported": imported,
+        "total_ms": round(elapsed * 1000, 3),
+        "files_per_s": round(len(paths) / elapsed, 2) if elapsed else None,
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+    }
+    return results
+
+
+def bench_writes(db: app.FrontOfficeDB, today: date, repeat: int) -> dict:
+    """Time the front-desk actions on bookings arriving today, undoing each one."""
+    arrivals = db.fetch_all(
+        """
+        SELECT r.id, r.room_number FROM reservations r
+        WHERE r.arrival_date >= ? AND r.arrival_date < ?
+        AND r.reservation_status = 'CONFIRMED'
+        AND NOT EXISTS (SELECT 1 FROM stays s WHERE s.reservation_id = r.id)
+        """,
+        app.day_bounds(today + timedelta(days=7)),
+    )[:repeat]
+    if not arrivals:
+        return {}
+
+    results = {}
+
+    def per_call(name, fn, items):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = (time.perf_counter() - start) * 1000
+        results[name] = {"n": len(items), "mean_ms": round(elapsed / len(items), 3), "total_ms": round(elapsed, 3)}
+
+    per_call("checkin_reservation", lambda r: db.checkin_reservation(r["id"]), arrivals)
+    stay_ids = [
+        s["id"] for s in db.fetch_all(
+            f"SELECT id FROM stays WHERE reservation_id IN ({','.join('?' * len(arrivals))})",
+            tuple(r["id"] for r in arrivals),
+        )
+    ]
+    per_call("checkout_stay", db.checkout_stay, stay_ids)
+    per_call("cancel_checkout", db.cancel_checkout, stay_ids)
+    per_call("cancel_checkin", db.cancel_checkin, stay_ids)
+    per_call("update_reservation_room", lambda r: db.update_reservation_room(r["id"], r["room_number"]), arrivals)
+    per_call("update_reservation_notes", lambda r: db.update_reservation_notes(r["id"], "Benchmark note", ""), arrivals)
+    per_call("set_room_status", lambda r: db.set_room_status(r["room_number"], "DIRTY"), arrivals)
+    per_call(
+        "add_payment",
+        lambda r: db.add_payment(r["id"], "BENCH", 10.0, "PAYMENT", "CARD", "", ""),
+        arrivals,
+    )
+    per_call("set_spare_rooms_for_date", lambda r: db.set_spare_rooms_for_date(today, [r["room_number"]] * 5), arrivals)
+
+    rooms = pd.DataFrame(db.fetch_all("SELECT room_number, status FROM rooms ORDER BY room_key"))
+    rooms.columns = ["Room", "Status"]
+    edited = rooms.copy()
+    edited.loc[edited.index[::10], "Status"] = "CLEAN"
+    results["save_room_status_edits"] = time_call(lambda: db.save_room_status_edits(rooms, edited), 5)
+    return results
+
+
+def compare(current: dict, baseline_path: str, tolerance: float) -> list:
+    """Names of timings that got slower than baseline * tolerance (by median, else mean)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for group, cases in current["results"].items():
+        for name, timing in cases.items():
+            before = baseline.get("results", {}).get(group, {}).get(name)
+            if not before:
+                continue
+            key = next((k for k in ("median_ms", "mean_ms", "total_ms") if k in timing and k in before), None)
+            if key is None or not before[key]:
+                continue
+            ratio = timing[key] / before[key]
+            flag = "REGRESSION" if ratio > tolerance else ""
+            print(f"{group:8} {name:42} {before[key]:10.3f} -> {timing[key]:10.3f} ms  x{ratio:5.2f} {flag}")
+            if flag:
+                regressions.append(f"{group}/{name}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=3, help="years of booking history (default 3)")
+    parser.add_argument("--rooms", type=int, default=200, help="room count, 200-2000 (default 200)")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per read method (default 20)")
+    parser.add_argument("--import-files", type=int, default=5, help="arrivals files to import (default 5)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="keep the generated database at this path (default: temp file)")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown ratio (default 1.25)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="fo_bench_")
+    dbpath = args.db or os.path.join(workdir, "bench.db")
+    if os.path.exists(dbpath):
+        parser.error(f"{dbpath} already exists; the benchmark only writes to a new file")
+
+    blocks = scaled_room_blocks(args.rooms)
+    rooms = [rn for start, end in blocks for rn in range(start, end + 1)]
+    # The benchmark hotel has its own room list and no arrivals folder to auto-import
+    app.ROOM_BLOCKS = blocks
+    app.ARRIVALS_ROOT = os.path.join(workdir, "arrivals")
+    os.makedirs(app.ARRIVALS_ROOT)
+
+    today = date.today()
+    rng = random.Random(args.seed)
+    db = app.FrontOfficeDB(dbpath)
+
+    print(f"Generating {args.years} years for {len(rooms)} rooms...", flush=True)
+    start = time.perf_counter()
+    counts = generate_dataset(db, args.years, rooms, today, seed=args.seed)
+    generate_s = time.perf_counter() - start
+    print(f"  {counts} in {generate_s:.1f}s", flush=True)
+
+    sample_days = [today + timedelta(days=rng.randint(-365 * args.years + 7, 60)) for _ in range(10)] + [today]
+
+    print("Timing reads...", flush=True)
+    reads = bench_reads(db, sample_days, args.repeat)
+
+    print("Timing import...", flush=True)
+    import_days = [today + timedelta(days=rng.randint(1, 60)) for _ in range(args.import_files)]
+    paths = write_arrivals_files(db, app.ARRIVALS_ROOT, import_days)
+    imports = bench_import(db, paths)
+
+    print("Timing writes...", flush=True)
+    writes = bench_writes(db, today, args.repeat)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "years": args.years,
+            "rooms": len(rooms),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "rows": counts,
+            "generate_s": round(generate_s, 2),
+            "schema_version": db.schema_version(),
+        },
+        "results": {"read": reads, "import": imports, "write": writes},
+    }
+    db.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    for group, cases in results["results"].items():
+        for name, timing in cases.items():
+            shown = timing.get("median_ms", timing.get("mean_ms", timing.get("total_ms")))
+            print(f"{group:8} {name:42} {shown:10.3f} ms")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over x{args.tolerance}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
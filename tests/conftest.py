@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh FrontOfficeDB in a temp dir, with an empty arrivals folder and parse cache."""
+    monkeypatch.setattr(app, "ARRIVALS_ROOT", str(tmp_path / "arrivals"))
+    monkeypatch.setattr(app, "PARSE_CACHE_DIR", str(tmp_path / "parse_cache"))
+    front_office = app.FrontOfficeDB(str(tmp_path / "hotelfo.db"))
+    yield front_office
+    front_office.close()
+
+
+ARRIVALS_HEADER = ["Reservation No.", "Arrival Date", "Depart", "Room", "Guest or Group's name", "Nights", "AD", "Tot. guests"]
+
+
+def write_arrivals_csv(path, rows, mtime=None):
+    """Write an arrivals export: rows are (reservation_no, arrival, depart, room, guest) with dates as date objects."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = [",".join(f'"{h}"' for h in ARRIVALS_HEADER)]
+    for reservation_no, arrival, depart, room, guest in rows:
+        nights = (depart - arrival).days
+        lines.append(f"{reservation_no},{arrival:%d.%m.%Y},{depart:%d.%m.%Y},{room},{guest},{nights},2,2")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def add_stay(db, room, checkin, checkout, status="CHECKED_IN", checkout_actual=None):
+    """A reservation and its stay in `room`; dates are ISO text."""
+    with db.transaction() as c:
+        c.execute(
+            "INSERT INTO reservations (reservation_no, arrival_date, depart_date, room_number, guest_name) VALUES (?, ?, ?, ?, ?)",
+            (f"R{room}", checkin[:10], checkout[:10], room, f"Guest {room}"),
+        )
+        c.execute(
+            """
+            INSERT INTO stays (reservation_id, room_number, status, checkin_planned, checkout_planned, checkout_actual)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (c.lastrowid, room, status, checkin, checkout, checkout_actual),
+        )
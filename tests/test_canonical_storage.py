@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+
+import app
+
+NUMBERS = ["302", "0302", "302.0", " 302 ", "302A", "12-34", "A12", "1.5", "12.", "", "nan", None]
+
+
+@pytest.mark.parametrize("value", NUMBERS)
+def test_canonical_number_sql_matches_python(value):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (v TEXT)")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.execute(f"UPDATE t SET v = {app._canonical_number_sql('v')}")
+    assert conn.execute("SELECT v FROM t").fetchone()[0] == app.canonical_number(value)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-01-31", "2026-01-31"),
+    ("2026-01-31 14:05:00", "2026-01-31"),
+    ("31.01.2026", "31.01.2026"),
+    ("NaT", None),
+    (" nan ", None),
+    ("", None),
+    (None, None),
+])
+def test_iso_date_sql_keeps_values_it_cannot_convert(value, expected):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (v TEXT)")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.execute(f"UPDATE t SET v = {app._iso_date_sql('v')}")
+    assert conn.execute("SELECT v FROM t").fetchone()[0] == expected
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+
+import pytest
+
+import app
+from conftest import add_stay
+
+
+@pytest.mark.parametrize("day, bounds", [
+    (date(2026, 1, 31), ("2026-01-31", "2026-02-01")),
+    (date(2026, 2, 28), ("2026-02-28", "2026-03-01")),
+    (date(2028, 2, 28), ("2028-02-28", "2028-02-29")),
+    (date(2028, 2, 29), ("2028-02-29", "2028-03-01")),
+    (date(2026, 12, 31), ("2026-12-31", "2027-01-01")),
+    (datetime(2026, 12, 31, 23, 59), ("2026-12-31", "2027-01-01")),
+    ("2026-12-31 14:00:00", ("2026-12-31", "2027-01-01")),
+])
+def test_day_bounds_cross_month_and_year_ends(day, bounds):
+    assert app.day_bounds(day) == bounds
+
+
+def board(db, day):
+    return sorted((task["tasktype"], task["room"]) for task in db.generate_hsk_tasks_for_date(day))
+
+
+def test_stayover_across_new_year(db):
+    add_stay(db, "101", "2026-12-30", "2027-01-02")
+    add_stay(db, "102", "2026-12-31 15:00:00", "2027-01-01 11:00:00")
+
+    assert board(db, date(2026, 12, 30)) == [("ARRIVAL", "101")]
+    assert board(db, date(2026, 12, 31)) == [("ARRIVAL", "102"), ("STAYOVER", "101")]
+    assert board(db, date(2027, 1, 1)) == [("CHECKOUT", "102"), ("STAYOVER", "101")]
+    assert board(db, date(2027, 1, 2)) == [("CHECKOUT", "101")]
+
+
+def test_stayover_across_month_end(db):
+    add_stay(db, "103", "2026-01-30", "2026-02-02")
+
+    assert board(db, date(2026, 1, 31)) == [("STAYOVER", "103")]
+    assert board(db, date(2026, 2, 1)) == [("STAYOVER", "103")]
+    assert board(db, date(2026, 2, 2)) == [("CHECKOUT", "103")]
+
+
+def test_board_shows_an_early_checkout_on_the_day_the_guest_left(db):
+    add_stay(db, "101", "2026-03-01", "2026-03-05", status="CHECKED_OUT", checkout_actual="2026-03-03 09:30:00")
+    add_stay(db, "102", "2026-03-01", "2026-03-03")
+
+    tasks = [(task["tasktype"], task["room"], task["priority"]) for task in db.generate_hsk_tasks_for_date(date(2026, 3, 3))]
+    assert tasks == [("CHECKOUT", "101", "URGENT"), ("CHECKOUT", "102", "HIGH")]
+    assert db.generate_hsk_tasks_for_date(date(2026, 3, 5)) == []
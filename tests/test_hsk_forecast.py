@@ -0,0 +1,21 @@
+from datetime import date
+
+from conftest import add_stay
+
+
+def forecast(db, start, days):
+    df = db.get_hsk_forecast(start, days)
+    return sorted(df[["task_date", "task_type", "room_number", "priority"]].itertuples(index=False, name=None))
+
+
+def test_early_checkout_is_cleaned_on_the_day_the_guest_left(db):
+    add_stay(db, "101", "2026-03-01", "2026-03-05", status="CHECKED_OUT", checkout_actual="2026-03-03 09:30:00")
+    add_stay(db, "102", "2026-03-01", "2026-03-04")
+
+    assert forecast(db, date(2026, 3, 2), 4) == [
+        ("2026-03-02", "STAYOVER", "102", "MEDIUM"),
+        ("2026-03-03", "CHECKOUT", "101", "URGENT"),
+        ("2026-03-03", "STAYOVER", "102", "MEDIUM"),
+        ("2026-03-04", "CHECKOUT", "102", "HIGH"),
+    ]
+
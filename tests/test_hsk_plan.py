@@ -0,0 +1,64 @@
+import app
+
+
+def task(room, tasktype="STAYOVER", notes=(), status="Pending"):
+    return {"room": str(room), "tasktype": tasktype, "notes": list(notes), "Status": status}
+
+
+def rooms(sheets):
+    return [[t["room"] for t in sheet] for sheet in sheets]
+
+
+def loads(sheets):
+    return [sum(t["minutes"] for t in sheet) for sheet in sheets]
+
+
+def test_loads_are_balanced():
+    tasks = [task(101 + n, "CHECKOUT" if n % 3 == 0 else "STAYOVER") for n in range(11)]
+    tasks.append(task(301, notes=["VIP/SPECIAL"]))
+
+    sheets = app.plan_hsk_assignments(tasks, 4)
+
+    assert loads(sheets) == [60, 60, 60, 70]
+
+
+def test_each_sheet_is_a_contiguous_run_of_rooms():
+    tasks = [task(room) for room in (502, 101, 305, 103, 410, 102, 301, 500)]
+
+    sheets = app.plan_hsk_assignments(tasks, 3)
+
+    walked = [room for sheet in rooms(sheets) for room in sheet]
+    assert walked == sorted(walked, key=int)
+    assert all(sheet for sheet in sheets)
+
+
+def test_more_attendants_than_tasks():
+    sheets = app.plan_hsk_assignments([task(101, "CHECKOUT"), task(102)], 4)
+
+    assert rooms(sheets) == [["101"], ["102"], [], []]
+
+
+def test_all_tasks_done():
+    tasks = [task(101, status="DONE"), task(102, "CHECKOUT", status="DONE")]
+
+    assert app.plan_hsk_assignments(tasks, 3) == [[], [], []]
+
+
+def test_replan_drops_done_tasks_and_slots_new_ones_next_door():
+    tasks = [task(room) for room in range(101, 107)]
+    sheets = app.plan_hsk_assignments(tasks, 3)
+    assert rooms(sheets) == [["101", "102"], ["103", "104"], ["105", "106"]]
+
+    tasks[2]["Status"] = "DONE"
+    tasks.append(task(107))
+    replanned = app.replan_hsk_assignments(sheets, tasks)
+
+    assert rooms(replanned) == [["101", "102"], ["104", "105"], ["106", "107"]]
+    assert loads(replanned) == [30, 30, 30]
+
+
+def test_replan_without_board_changes_keeps_the_plan():
+    tasks = [task(room, "CHECKOUT" if room % 2 else "STAYOVER") for room in range(101, 109)]
+    sheets = app.plan_hsk_assignments(tasks, 3)
+
+    assert rooms(app.replan_hsk_assignments(sheets, tasks)) == rooms(sheets)
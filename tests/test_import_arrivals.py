@@ -0,0 +1,231 @@
+from datetime import date, timedelta
+
+import openpyxl
+
+import app
+from conftest import write_arrivals_csv
+
+ARRIVAL = date(2026, 3, 2)
+DEPART = date(2026, 3, 4)
+
+
+def reservation_numbers(db):
+    return sorted(row["reservation_no"] for row in db.fetch_all("SELECT reservation_no FROM reservations"))
+
+
+def test_first_run_imports_files_added_after_a_manifestless_import(db, tmp_path):
+    root = tmp_path / "arrivals"
+    # Filled by the old one-shot import, before the manifest existed
+    db.execute(
+        "INSERT INTO reservations (reservation_no, arrival_date, depart_date, guest_name) VALUES ('900', ?, ?, 'Old')",
+        (ARRIVAL.isoformat(), DEPART.isoformat()),
+    )
+    write_arrivals_csv(root / "2026-03" / "Arrivals 02.03.2026.csv", [
+        ("900", ARRIVAL, DEPART, "101", "Old"),
+        ("901", ARRIVAL, DEPART, "102", "New"),
+    ])
+
+    summary = db.import_new_arrivals(workers=1)
+
+    assert summary["errors"] == []
+    assert reservation_numbers(db) == ["900", "901"]
+
+
+def write_arrivals_xlsx(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Reservation No.", "Arrival Date", "Depart", "Room", "Guest or Group's name", "Nights", "AD", "Tot. guests"])
+    for reservation_no, arrival, depart, room, guest in rows:
+        ws.append([reservation_no, f"{arrival:%d.%m.%Y}", f"{depart:%d.%m.%Y}", room, guest, (depart - arrival).days, 2, 2])
+    wb.save(path)
+    return path
+
+
+def test_one_failing_file_does_not_stop_the_batch(db, tmp_path, monkeypatch):
+    root = tmp_path / "arrivals"
+    for day in range(3):
+        arrival = ARRIVAL + timedelta(days=day)
+        write_arrivals_xlsx(root / f"Arrivals {arrival:%d.%m.%Y}.xlsx", [
+            (f"90{day}", arrival, DEPART + timedelta(days=day), "101", "Guest"),
+        ])
+
+    upsert = db._upsert_reservations
+
+    def failing_upsert(c, df, source=None, **kwargs):
+        if source == "Arrivals 03.03.2026.xlsx":
+            raise ValueError("bad frame")
+        return upsert(c, df, source=source, **kwargs)
+
+    monkeypatch.setattr(db, "_upsert_reservations", failing_upsert)
+    summary = db.import_new_arrivals(workers=2)
+
+    assert summary["files"] == 2
+    assert summary["errors"] == [("Arrivals 03.03.2026.xlsx", "ValueError: bad frame")]
+    assert reservation_numbers(db) == ["900", "902"]
+    statuses = {row["path"]: row["status"] for row in db.fetch_all("SELECT path, status FROM import_manifest")}
+    assert statuses == {
+        "Arrivals 02.03.2026.xlsx": "OK",
+        "Arrivals 03.03.2026.xlsx": "ERROR",
+        "Arrivals 04.03.2026.xlsx": "OK",
+    }
+
+
+def test_parse_falls_back_when_the_process_pool_breaks(monkeypatch):
+    class BrokenPool:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def map(self, *args, **kwargs):
+            raise app.BrokenProcessPool("worker died")
+
+    monkeypatch.setattr(app, "ProcessPoolExecutor", BrokenPool)
+    results = list(app.FrontOfficeDB._parse_arrivals_files(["a.xlsx", "b.xlsx"], workers=2))
+
+    assert [path for path, _, _ in results] == ["a.xlsx", "b.xlsx"]
+    assert all(error for _, _, error in results)
+
+
+def vanished(db):
+    return sorted(
+        row["reservation_no"]
+        for row in db.fetch_all("SELECT reservation_no FROM reservation_changes WHERE change_type = 'VANISHED'")
+    )
+
+
+def test_older_export_does_not_vanish_bookings_a_newer_one_moved(db, tmp_path):
+    root = tmp_path / "arrivals"
+    write_arrivals_csv(root / "Arrivals 02.03.2026 b.csv", [
+        ("900", ARRIVAL, DEPART, "101", "Stays"),
+        ("902", ARRIVAL, DEPART, "103", "Moved here"),
+    ], mtime=1_770_000_000)
+    db.import_new_arrivals(workers=1)
+
+    # An export written before the one above turns up late
+    write_arrivals_csv(root / "Arrivals 02.03.2026 a.csv", [("900", ARRIVAL, DEPART, "101", "Stays")], mtime=1_760_000_000)
+    db.import_new_arrivals(workers=1)
+    assert vanished(db) == []
+
+    write_arrivals_csv(root / "Arrivals 02.03.2026 c.csv", [("900", ARRIVAL, DEPART, "101", "Stays")], mtime=1_780_000_000)
+    db.import_new_arrivals(workers=1)
+    assert vanished(db) == ["902"]
+
+
+def test_mixed_formats_import_in_path_order_with_one_mapping_load(db, tmp_path, monkeypatch):
+    root = tmp_path / "arrivals"
+    write_arrivals_xlsx(root / "Arrivals 01.03.2026.xlsx", [("901", ARRIVAL, DEPART, "101", "First")])
+    write_arrivals_csv(root / "Arrivals 02.03.2026.csv", [("902", ARRIVAL, DEPART, "102", "Second")])
+    write_arrivals_xlsx(root / "Arrivals 03.03.2026.xlsx", [("903", ARRIVAL, DEPART, "103", "Third")])
+
+    loads = []
+    load_mapping = app.load_arrivals_mapping
+    monkeypatch.setattr(app, "load_arrivals_mapping", lambda *args: loads.append(args) or load_mapping(*args))
+    db.import_new_arrivals(workers=1)
+
+    sources = [
+        row["source"]
+        for row in db.fetch_all("SELECT source FROM reservation_changes WHERE change_type = 'NEW' ORDER BY id")
+    ]
+    assert sources == ["Arrivals 01.03.2026.xlsx", "Arrivals 02.03.2026.csv", "Arrivals 03.03.2026.xlsx"]
+    assert len(loads) == 1
+
+
+def test_rejected_rows_are_not_counted_as_imported(db, tmp_path):
+    root = tmp_path / "arrivals"
+    rows = [("901", ARRIVAL, DEPART, "101", "Valid"), ("902", ARRIVAL, DEPART, "999", "Unknown room")]
+    write_arrivals_csv(root / "Arrivals 02.03.2026.csv", rows)
+    write_arrivals_xlsx(root / "Arrivals 02.03.2026.xlsx", rows)
+
+    summary = db.import_new_arrivals(workers=1)
+
+    assert summary["rows"] == 2
+    assert [row["rows"] for row in db.fetch_all("SELECT rows FROM import_manifest ORDER BY path")] == [1, 1]
+    assert db.fetch_one("SELECT COUNT(*) AS n FROM import_rejects")["n"] == 2
+
+
+def test_startup_leaves_new_files_to_the_watcher(db, tmp_path):
+    db.execute(
+        "INSERT INTO reservations (reservation_no, arrival_date, depart_date, guest_name) VALUES ('900', ?, ?, 'Old')",
+        (ARRIVAL.isoformat(), DEPART.isoformat()),
+    )
+    write_arrivals_csv(tmp_path / "arrivals" / "Arrivals 02.03.2026.csv", [("901", ARRIVAL, DEPART, "102", "New")],
+                       mtime=1_770_000_000)
+
+    restarted = app.FrontOfficeDB(db.dbpath)
+    assert reservation_numbers(restarted) == ["900"]
+
+    app.ArrivalsWatcher(restarted, root=str(tmp_path / "arrivals")).check_once()
+    assert reservation_numbers(restarted) == ["900", "901"]
+    restarted.close()
+
+
+def test_parser_workers_cache_in_the_configured_directory(db, tmp_path):
+    root = tmp_path / "arrivals"
+    for day in range(2):
+        arrival = ARRIVAL + timedelta(days=day)
+        write_arrivals_xlsx(root / f"Arrivals {arrival:%d.%m.%Y}.xlsx", [(f"90{day}", arrival, DEPART + timedelta(days=day), "101", "Guest")])
+
+    db.import_new_arrivals(workers=2)
+
+    assert len(list((tmp_path / "parse_cache").glob("*.parquet"))) == 2
+
+
+def write_export(path, bookings):
+    """An arrivals CSV with a meal plan; bookings are (reservation_no, depart, meal_plan, adults)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ['"Reservation No.","Arrival Date","Depart","Room","Guest or Group\'s name","Nights","AD","Tot. guests","Meal Plan"']
+    for reservation_no, depart, meal_plan, adults in bookings:
+        lines.append(f"{reservation_no},{ARRIVAL:%d.%m.%Y},{depart:%d.%m.%Y},,Guest {reservation_no},"
+                     f"{(depart - ARRIVAL).days},{adults},{adults},{meal_plan}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def changes(db):
+    return [
+        tuple(row.values())
+        for row in db.fetch_all(
+            "SELECT reservation_no, change_type, column_name, old_value, new_value FROM reservation_changes ORDER BY id"
+        )
+    ]
+
+
+def test_new_bookings_are_logged_once(db, tmp_path):
+    path = write_export(tmp_path / "arrivals" / "Arrivals.csv", [("801", DEPART, "BB", 2), ("802", DEPART, "RO", 1)])
+
+    assert db.import_arrivals_file(path) == 2
+
+    assert changes(db) == [("801", "NEW", None, None, None), ("802", "NEW", None, None, None)]
+
+
+def test_amended_fields_are_logged_once_each(db, tmp_path):
+    path = tmp_path / "arrivals" / "Arrivals.csv"
+    db.import_arrivals_file(write_export(path, [("801", DEPART, "BB", 2), ("802", DEPART, "RO", 1)]))
+    db.execute("DELETE FROM reservation_changes")
+
+    later = DEPART + timedelta(days=1)
+    db.import_arrivals_file(write_export(path, [("801", later, "HB", 2), ("802", DEPART, "RO", 3)]))
+
+    assert sorted(changes(db)) == [
+        ("801", "AMENDED", "depart_date", DEPART.isoformat(), later.isoformat()),
+        ("801", "AMENDED", "meal_plan", "BB", "HB"),
+        ("801", "AMENDED", "nights", "2", "3"),
+        ("802", "AMENDED", "adults", "1", "3"),
+        ("802", "AMENDED", "total_guests", "1", "3"),
+    ]
+
+
+def test_reimporting_an_unchanged_export_logs_nothing(db, tmp_path):
+    path = write_export(tmp_path / "arrivals" / "Arrivals.csv", [("801", DEPART, "BB", 2), ("802", DEPART, "RO", 1)])
+    db.import_arrivals_file(path)
+    db.execute("DELETE FROM reservation_changes")
+
+    assert db.import_arrivals_file(path) == 2
+
+    assert changes(db) == []
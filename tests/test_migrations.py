@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """Path of a database in the pre-migration layout, and a cursor to seed it; migrate with open_db()."""
+    monkeypatch.setattr(app, "ARRIVALS_ROOT", str(tmp_path / "arrivals"))
+    monkeypatch.setattr(app, "PARSE_CACHE_DIR", str(tmp_path / "parse_cache"))
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    app._migrate_base_schema(conn.cursor())
+    app._migrate_legacy_columns(conn.cursor())
+    conn.commit()
+    yield path, conn
+    conn.close()
+
+
+def open_db(path, conn):
+    conn.commit()
+    return app.FrontOfficeDB(path)
+
+
+def test_empty_total_rows_written_as_nat_are_removed(legacy_db):
+    path, conn = legacy_db
+    conn.executemany(
+        "INSERT INTO reservations (arrival_date, depart_date, reservation_no, guest_name, total_guests) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("NaT", "NaT", None, None, 6),
+            ("NaT", "NaT", None, None, 20),
+            ("2026-01-07 00:00:00", "2026-01-08 00:00:00", "150232685.0", "Kept Guest", 2),
+        ],
+    )
+
+    db = open_db(path, conn)
+
+    rows = db.fetch_all("SELECT arrival_date, depart_date, reservation_no FROM reservations")
+    assert rows == [{"arrival_date": "2026-01-07", "depart_date": "2026-01-08", "reservation_no": "150232685"}]
+
+
+def seed_reservations(conn, rows):
+    """(reservation_no, room_number, reservation_status, main_remark) rows; returns their ids."""
+    ids = []
+    for reservation_no, room, status, remark in rows:
+        cur = conn.execute(
+            """
+            INSERT INTO reservations (arrival_date, depart_date, reservation_no, guest_name, room_number,
+                                      reservation_status, main_remark)
+            VALUES ('2026-01-07', '2026-01-09', ?, 'Guest', ?, ?, ?)
+            """,
+            (reservation_no, room, status, remark),
+        )
+        ids.append(cur.lastrowid)
+    return ids
+
+
+def test_dedupe_repoints_stays_and_payments_to_the_kept_row(legacy_db):
+    path, conn = legacy_db
+    first, second, third = seed_reservations(conn, [
+        ("500.0", "101", "CONFIRMED", None),
+        ("500", "102", "CONFIRMED", None),
+        ("500", None, "CONFIRMED", None),
+    ])
+    conn.execute("INSERT INTO stays (reservation_id, room_number, status) VALUES (?, '101', 'CHECKED_OUT')", (first,))
+    conn.execute("INSERT INTO stays (reservation_id, room_number, status) VALUES (?, '102', 'CHECKED_IN')", (second,))
+    conn.execute("INSERT INTO payments (reservation_id, amount) VALUES (?, 50)", (third,))
+
+    db = open_db(path, conn)
+
+    assert db.fetch_all("SELECT id FROM reservations") == [{"id": second}]
+    assert {row["reservation_id"] for row in db.fetch_all("SELECT reservation_id FROM stays")} == {second}
+    assert db.fetch_one("SELECT reservation_id FROM payments")["reservation_id"] == second
+
+
+def test_dedupe_keeps_front_office_fields_of_dropped_rows(legacy_db):
+    path, conn = legacy_db
+    _, kept, _ = seed_reservations(conn, [
+        ("600", None, "CANCELLED", "Call before arrival"),
+        ("600", "305", "CONFIRMED", "PMS text"),
+        ("600", None, "CONFIRMED", "PMS text"),
+    ])
+    seed_reservations(conn, [("700", None, "CONFIRMED", "Untouched")])
+
+    db = open_db(path, conn)
+
+    rows = db.fetch_all(
+        "SELECT id, reservation_no, room_number, reservation_status, main_remark, pms_main_remark FROM reservations ORDER BY reservation_no"
+    )
+    assert rows[0] == {
+        "id": kept, "reservation_no": "600", "room_number": "305", "reservation_status": "CANCELLED",
+        "main_remark": "Call before arrival", "pms_main_remark": "PMS text",
+    }
+    assert rows[1]["main_remark"] == rows[1]["pms_main_remark"] == "Untouched"
+    assert len(rows) == 2
@@ -0,0 +1,15 @@
+def test_executemany_is_profiled(db, tmp_path):
+    profiler = db.enable_profiling(slow_ms=10_000, log_path=str(tmp_path / "slow.jsonl"))
+    profiler.begin_render("Room list")
+
+    changed = db.executemany(
+        "INSERT INTO rooms (room_number, status) VALUES (?, 'VACANT')",
+        [("9001",), ("9002",), ("9003",)],
+    )
+
+    assert changed == 3
+    stats = {s["sql"]: s for s in profiler.statement_stats()}
+    insert = next(s for sql, s in stats.items() if sql.startswith("INSERT INTO rooms"))
+    assert insert["calls"] == 1
+    assert insert["rows"] == 3
+    assert profiler.render_stats()[0]["statements"] == 1
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import app
+
+REMARKS = [
+    "2T please",
+    "Birthday cake at 8pm",
+    "DISABLED guest, ground floor",
+    "Parking: POA",
+    "vip Birthday 2t Accessible",
+    "quiet room",
+    "",
+]
+
+
+@pytest.mark.parametrize("remark", REMARKS)
+def test_classify_remarks_agrees_with_remark_flags(remark):
+    vectorised = app.classify_remarks(pd.Series([remark])).iloc[0].to_dict()
+
+    assert {flag: int(value) for flag, value in vectorised.items()} == app.remark_flags(remark)
+
+
+@pytest.mark.parametrize("remark, flag", [
+    ("2t", "flag_twin"),
+    ("Birthday", "flag_vip"),
+    ("Disabled", "flag_accessible"),
+    ("poa", "flag_parking"),
+])
+def test_each_rule_sets_only_its_flag(remark, flag):
+    assert app.remark_flags(remark) == {name: int(name == flag) for name in app.REMARK_FLAGS}
+
+
+def test_missing_remarks_set_no_flag():
+    assert app.classify_remarks(pd.Series([None])).iloc[0].sum() == 0
+    assert app.remark_flags(None, None) == dict.fromkeys(app.REMARK_FLAGS, 0)
+
+
+def test_update_reservation_notes_stores_the_flags(db):
+    reservation_id = db.execute(
+        "INSERT INTO reservations (reservation_no, arrival_date, depart_date, guest_name, main_remark) "
+        "VALUES ('700', '2026-03-02', '2026-03-04', 'Guest', '2T')"
+    ).lastrowid
+    db.update_reservation_notes(reservation_id, "VIP, parking POA", "")
+
+    stored = db.fetch_one(f"SELECT {', '.join(app.REMARK_FLAGS)} FROM reservations WHERE id = ?", (reservation_id,))
+    assert stored == {"flag_twin": 0, "flag_vip": 1, "flag_accessible": 0, "flag_parking": 1}
+
+    db.update_reservation_notes(reservation_id, "", "wheelchair, disabled access")
+
+    stored = db.fetch_one(f"SELECT {', '.join(app.REMARK_FLAGS)} FROM reservations WHERE id = ?", (reservation_id,))
+    assert stored == {"flag_twin": 0, "flag_vip": 0, "flag_accessible": 1, "flag_parking": 0}
@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+import app
+
+
+def test_replace_database_file_swaps_file_and_keeps_backup(db, tmp_path):
+    db.execute("INSERT INTO rooms (room_number, status) VALUES ('9999', 'VACANT')")
+
+    upload = tmp_path / "upload.db"
+    conn = sqlite3.connect(upload)
+    conn.execute("CREATE TABLE uploaded (id INTEGER)")
+    conn.commit()
+    conn.close()
+
+    app.replace_database_file(db, upload.read_bytes())
+
+    with sqlite3.connect(db.dbpath) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {"uploaded"}
+
+    # The backup includes the write that was still in the WAL
+    with sqlite3.connect(db.dbpath + ".backup") as conn:
+        rows = conn.execute("SELECT status FROM rooms WHERE room_number = '9999'").fetchall()
+    assert rows == [("VACANT",)]
+
+
+def test_checkpoint_refuses_open_transaction(db):
+    with db.transaction():
+        with pytest.raises(sqlite3.OperationalError):
+            db.checkpoint()
@@ -0,0 +1,43 @@
+import sqlite3
+
+import app
+
+
+def add_reservation(db, reservation_no, room, guest):
+    db.execute(
+        "INSERT INTO reservations (reservation_no, arrival_date, depart_date, room_number, guest_name) VALUES (?, '2026-03-02', '2026-03-04', ?, ?)",
+        (reservation_no, room, guest),
+    )
+
+
+def test_match_query_prefixes_words_and_keeps_room_numbers_whole():
+    assert app.fts_match_query("smi guest:ann") == '"smi"* AND {guest_name} : "ann"*'
+    assert app.fts_match_query("room:101.0") == '{room_number} : "101"'
+    assert app.fts_match_query('"; DROP') == '"DROP"*'
+    assert app.fts_match_query("  ") is None
+
+
+def test_room_searches_match_the_whole_canonical_number(db):
+    add_reservation(db, "900", "101", "Ann Smith")
+    add_reservation(db, "901", "1012", "Bob Smithers")
+
+    assert [r["reservation_no"] for r in db.search_reservations_by_room_number("101.0")] == ["900"]
+    assert [r["reservation_no"] for r in db.search_reservations("room:101")] == ["900"]
+    assert sorted(r["reservation_no"] for r in db.search_reservations("smith")) == ["900", "901"]
+
+
+def test_index_errors_are_reported_before_falling_back(db, monkeypatch):
+    add_reservation(db, "900", "101", "Ann Smith")
+    warnings = []
+    monkeypatch.setattr(app.st, "warning", warnings.append)
+    fetch_all = db.fetch_all
+
+    def broken_index(query, params=None):
+        if "MATCH" in query:
+            raise sqlite3.OperationalError("database disk image is malformed")
+        return fetch_all(query, params)
+
+    monkeypatch.setattr(db, "fetch_all", broken_index)
+
+    assert [r["reservation_no"] for r in db.search_reservations("Smith")] == ["900"]
+    assert len(warnings) == 1 and "malformed" in warnings[0]
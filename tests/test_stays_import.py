@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+HEADER = "id,reservation_id,room_number,status,checkin_planned,checkout_planned,checkin_actual,checkout_actual"
+
+
+def csv(*lines):
+    return io.StringIO("\n".join((HEADER,) + lines) + "\n")
+
+
+def stay_count(db):
+    return db.fetch_one("SELECT COUNT(*) AS n FROM stays")["n"]
+
+
+def test_missing_required_column_writes_nothing(db):
+    source = io.StringIO("id,reservation_id,room_number,status\n1,10,101,CHECKED_IN\n")
+
+    with pytest.raises(ValueError, match="checkin_planned, checkout_planned"):
+        db.import_stays_csv(source)
+
+    assert stay_count(db) == 0
+
+
+def test_rejected_rows_are_reported_with_line_and_reason(db):
+    result = db.import_stays_csv(csv(
+        "1,10,101.0,checked_in,2026-03-01,2026-03-03,2026-03-01 15:00:00,",
+        "2,,102,CHECKED_IN,2026-03-01,2026-03-03,,",
+        "3,12,103,CHECKED_IN,2026-03-05,2026-03-03,,",
+        "4,13,104,LEFT,2026-03-01,2026-03-03,,",
+    ))
+
+    assert (result["read"], result["imported"]) == (4, 1)
+    assert [(row["line"], row["reason"]) for row in result["rejected"]] == [
+        (3, "reservation_id missing or not a whole number"),
+        (4, "checkout_planned before checkin_planned"),
+        (5, "status must be CHECKED_IN or CHECKED_OUT"),
+    ]
+    stay = db.fetch_one("SELECT room_number, status, checkin_actual FROM stays")
+    assert stay == {"room_number": "101", "status": "CHECKED_IN", "checkin_actual": "2026-03-01 15:00:00"}
+
+
+def test_file_spanning_several_chunks(db):
+    lines = [f"{n},{10 + n},{100 + n},CHECKED_IN,2026-03-01,2026-03-03,," for n in range(1, 6)]
+    lines[3] = "4,14,,CHECKED_IN,2026-03-01,2026-03-03,,"
+    progress = []
+
+    result = db.import_stays_csv(csv(*lines), chunksize=2, progress=lambda *args: progress.append(args))
+
+    assert progress == [(2, 2, 0), (4, 3, 1), (5, 4, 1)]
+    assert [(row["line"], row["reason"]) for row in result["rejected"]] == [(5, "room_number missing")]
+    assert stay_count(db) == 4
+
+
+def test_failure_after_the_last_chunk_rolls_everything_back(db, monkeypatch):
+    def fail():
+        raise RuntimeError("sync failed")
+
+    monkeypatch.setattr(db, "sync_room_status_from_stays", fail)
+
+    with pytest.raises(RuntimeError):
+        db.import_stays_csv(csv("1,10,101,CHECKED_IN,2026-03-01,2026-03-03,,"), chunksize=1)
+
+    assert stay_count(db) == 0